@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_lnd import FakeLnd, create_lnd_dir, generate_graph, start_server
+
+REBALANCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rebalance.py")
+
+
+def measure(arguments):
+    # seconds until the first byte is written, and until the process exits, and the output
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, REBALANCE] + arguments, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    output = process.stdout.read(1)
+    first_output = time.perf_counter() - start
+    output += process.stdout.read()
+    process.wait()
+    return first_output, time.perf_counter() - start, output.decode()
+
+
+def main():
+    arguments = get_argument_parser().parse_args()
+    with tempfile.TemporaryDirectory() as lnd_dir:
+        create_lnd_dir(lnd_dir, "regtest")
+        graph = generate_graph(arguments.nodes, arguments.nodes * 5, arguments.own_channels, seed=1)
+        server, port = start_server(FakeLnd(graph), lnd_dir)
+        node = ["--lnddir", lnd_dir, "--grpc", f"localhost:{port}", "--network", "regtest"]
+        own_pubkey = graph.own_pubkey
+        channels = sorted(graph.get_own_channels(), key=lambda channel: channel.get_balance_msat(own_pubkey))
+        # the adjusted amount is below --min-amount, so that nothing is sent after the channels are loaded
+        no_op = ["-f", str(channels[-1].chan_id), "-t", str(channels[0].chan_id), "-A", "--min-amount", "100000000"]
+        commands = {
+            # name: (arguments, expected output)
+            "--help": (["--help"], "usage"),
+            "-A": (node + no_op, "nothing to do"),
+            "-c": (node + ["-c"], None),
+        }
+        try:
+            print(f"{'command':10} {'first output (ms)':>20} {'total (ms)':>12}")
+            for name, (command, expected_output) in commands.items():
+                # the first run warms up the file system cache and writes the byte code
+                output = measure(command)[2]
+                if expected_output is not None and expected_output not in output:
+                    raise Exception(f"Unexpected output of {name}: {output}")
+                results = [measure(command) for _ in range(arguments.runs)]
+                first_output_ms = statistics.median(result[0] for result in results) * 1_000
+                total_ms = statistics.median(result[1] for result in results) * 1_000
+                print(f"{name:10} {first_output_ms:20,.0f} {total_ms:12,.0f}")
+        finally:
+            server.stop(None)
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Measures the time until rebalance.py prints its first output (median of several runs)"
+    )
+    parser.add_argument("--runs", type=int, default=10, help="number of runs per command (default: 10)")
+    parser.add_argument("--nodes", type=int, default=100, help="number of nodes of the fake node (default: 100)")
+    parser.add_argument(
+        "--own-channels", type=int, default=50, help="number of channels of the fake node (default: 50)"
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+MISSING = object()
+
+
+class Cache:
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            if entry is not MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def __contains__(self, key):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            if entry is MISSING:
+                return False
+            expires_at = entry[1]
+            return expires_at is None or expires_at > time.monotonic()
+
+    def put(self, key, value):
+        expires_at = None
+        if self.ttl is not None:
+            expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            if self.max_size is not None:
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+
+    def update(self, values):
+        for key, value in values.items():
+            self.put(key, value)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+
+def cache_key(*args, **kwargs):
+    return args, tuple(sorted(kwargs.items()))
+
+
+def cached(name):
+    # caches the results of a method in the cache with the given name in self.caches
+    def decorator(function):
+        @wraps(function)
+        def wrapper(self, *args, **kwargs):
+            cache = self.caches[name]
+            key = cache_key(*args, **kwargs)
+            value = cache.get(key, MISSING)
+            if value is MISSING:
+                value = function(self, *args, **kwargs)
+                cache.put(key, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+from graph import get_channel_point_string
+from grpc_generated import lightning_pb2 as ln
+
+
+class ChannelTracker:
+    def __init__(self, channels):
+        self.channels = {}
+        self.channel_ids_by_peer = defaultdict(set)
+        for channel in channels:
+            self.add_channel(channel)
+
+    def add_channel(self, channel):
+        self.channels[channel.chan_id] = channel
+        self.channel_ids_by_peer[channel.remote_pubkey].add(channel.chan_id)
+
+    def remove_channel(self, channel_id):
+        channel = self.channels.pop(channel_id, None)
+        if channel is not None:
+            self.channel_ids_by_peer[channel.remote_pubkey].discard(channel_id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_peer_channels(self, pub_key):
+        channels = [self.channels.get(channel_id) for channel_id in list(self.channel_ids_by_peer.get(pub_key, ()))]
+        return [channel for channel in channels if channel is not None]
+
+    def get_channels(self, active_only=False, public_only=False, private_only=False):
+        result = []
+        for channel in list(self.channels.values()):
+            if active_only and not channel.active:
+                continue
+            if public_only and channel.private:
+                continue
+            if private_only and not channel.private:
+                continue
+            result.append(channel)
+        return result
+
+    def apply_event(self, channel_event_update):
+        update_type = channel_event_update.type
+        if update_type == ln.ChannelEventUpdate.OPEN_CHANNEL:
+            self.add_channel(channel_event_update.open_channel)
+        elif update_type == ln.ChannelEventUpdate.CLOSED_CHANNEL:
+            self.remove_channel(channel_event_update.closed_channel.chan_id)
+        elif update_type == ln.ChannelEventUpdate.ACTIVE_CHANNEL:
+            self.set_active(channel_event_update.active_channel, True)
+        elif update_type == ln.ChannelEventUpdate.INACTIVE_CHANNEL:
+            self.set_active(channel_event_update.inactive_channel, False)
+
+    def set_active(self, channel_point, active):
+        channel_point_string = get_channel_point_string(channel_point)
+        for channel in list(self.channels.values()):
+            if channel.channel_point == channel_point_string:
+                self.update_channel(channel.chan_id, lambda c: setattr(c, "active", active))
+                return
+
+    def apply_route(self, route):
+        # channel events do not contain balance changes, so our own payments are applied explicitly
+        first_hop = route.hops[0]
+        last_hop = route.hops[-1]
+        self.update_channel(first_hop.chan_id, lambda c: move_balance(c, -route.total_amt))
+        self.update_channel(last_hop.chan_id, lambda c: move_balance(c, last_hop.amt_to_forward))
+
+    def update_channel(self, channel_id, update):
+        # channels are replaced instead of modified, so that readers in other threads never see partial updates
+        existing_channel = self.channels.get(channel_id)
+        if existing_channel is None:
+            return
+        channel = ln.Channel()
+        channel.CopyFrom(existing_channel)
+        update(channel)
+        self.channels[channel_id] = channel
+
+
+def move_balance(channel, amount):
+    channel.local_balance += amount
+    channel.remote_balance -= amount
@@ -0,0 +1,2 @@
+# settings shared by the command line interface and lnd.py, this module must not import anything expensive
+MAX_CONCURRENT_REQUESTS = 10
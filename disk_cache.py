@@ -0,0 +1,70 @@
+import sqlite3
+import time
+
+DEFAULT_EDGE_TTL = 10 * 60
+DEFAULT_ALIAS_TTL = 7 * 24 * 60 * 60
+# lnd forgets about failures after about an hour (half-life of the a priori probability)
+DEFAULT_PAIR_TTL = 60 * 60
+
+
+class DiskCache:
+    def __init__(self, path, edge_ttl=DEFAULT_EDGE_TTL, alias_ttl=DEFAULT_ALIAS_TTL, pair_ttl=DEFAULT_PAIR_TTL):
+        self.ttls = {
+            "edge": edge_ttl,
+            "alias": alias_ttl,
+            "pair": pair_ttl,
+        }
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self.connection.commit()
+
+    def get(self, kind, key):
+        return self.get_many(kind, [key]).get(key)
+
+    def get_many(self, kind, keys):
+        keys = list(keys)
+        result = {}
+        min_stored_at = time.time() - self.ttls[kind]
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, value FROM entries WHERE kind = ? AND stored_at >= ? AND key IN ({placeholders})",
+                [kind, min_stored_at] + [str(key) for key in chunk],
+            )
+            values = dict(rows.fetchall())
+            for key in chunk:
+                if str(key) in values:
+                    result[key] = values[str(key)]
+        return result
+
+    def get_all(self, kind):
+        rows = self.connection.execute(
+            "SELECT key, value FROM entries WHERE kind = ? AND stored_at >= ?",
+            [kind, time.time() - self.ttls[kind]],
+        )
+        return dict(rows.fetchall())
+
+    def put(self, kind, key, value):
+        self.put_many(kind, {key: value})
+
+    def put_many(self, kind, values):
+        if not values:
+            return
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO entries (kind, key, value, stored_at) VALUES (?, ?, ?, ?)",
+            [(kind, str(key), value, now) for key, value in values.items()],
+        )
+        self.connection.commit()
+
+    def invalidate(self, kind, key):
+        self.connection.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (kind, str(key)))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,747 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import heapq
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from grpc_generated import router_pb2 as lnrouter
+from grpc_generated import router_pb2_grpc as lnrouterrpc
+from grpc_generated import lightning_pb2 as ln
+from grpc_generated import lightning_pb2_grpc as lnrpc
+from grpc_generated import invoices_pb2 as invoices
+from grpc_generated import invoices_pb2_grpc as invoicesrpc
+
+CAPACITIES = [1_000_000, 2_000_000, 5_000_000, 10_000_000, 16_777_215]
+BASE_FEES_MSAT = [0, 0, 1_000]
+MAX_FEE_RATE = 5_000
+TIME_LOCK_DELTA = 40
+FINAL_CLTV_DELTA = 80
+# added by lnd to the final CLTV delta, so that the payment does not fail if a block is found in the meantime
+BLOCK_PADDING = 3
+BLOCK_HEIGHT = 800_000
+INVOICE_EXPIRY = 3_600
+MAX_WORKERS = 32
+
+
+class FakeChannel:
+    def __init__(self, chan_id, channel_point, node1_pub, node2_pub, capacity, node1_balance_msat, node1_policy,
+                 node2_policy):
+        self.chan_id = chan_id
+        self.channel_point = channel_point
+        self.node1_pub = node1_pub
+        self.node2_pub = node2_pub
+        self.capacity = capacity
+        self.node1_balance_msat = node1_balance_msat
+        self.node1_policy = node1_policy
+        self.node2_policy = node2_policy
+
+    def get_peer(self, pub_key):
+        if pub_key == self.node1_pub:
+            return self.node2_pub
+        return self.node1_pub
+
+    def get_policy(self, from_pub):
+        # node1_policy contains the fee base and rate for payments from node1 to node2
+        if from_pub == self.node1_pub:
+            return self.node1_policy
+        return self.node2_policy
+
+    def get_balance_msat(self, pub_key):
+        if pub_key == self.node1_pub:
+            return self.node1_balance_msat
+        return self.capacity * 1_000 - self.node1_balance_msat
+
+    def move_balance(self, from_pub, amount_msat):
+        if from_pub == self.node1_pub:
+            self.node1_balance_msat -= amount_msat
+        else:
+            self.node1_balance_msat += amount_msat
+
+    def to_edge(self):
+        return ln.ChannelEdge(
+            channel_id=self.chan_id,
+            chan_point=self.channel_point,
+            node1_pub=self.node1_pub,
+            node2_pub=self.node2_pub,
+            capacity=self.capacity,
+            node1_policy=self.node1_policy,
+            node2_policy=self.node2_policy,
+        )
+
+
+class FakeGraph:
+    def __init__(self, own_pubkey, aliases, channels):
+        self.own_pubkey = own_pubkey
+        self.aliases = aliases
+        self.channels = {channel.chan_id: channel for channel in channels}
+        self.channels_by_node = {pub_key: [] for pub_key in aliases}
+        for channel in channels:
+            self.channels_by_node[channel.node1_pub].append(channel)
+            self.channels_by_node[channel.node2_pub].append(channel)
+
+    def get_own_channels(self):
+        return self.channels_by_node[self.own_pubkey]
+
+    def add_channel(self, channel):
+        self.channels[channel.chan_id] = channel
+        self.channels_by_node[channel.node1_pub].append(channel)
+        self.channels_by_node[channel.node2_pub].append(channel)
+
+    def remove_channel(self, chan_id):
+        channel = self.channels.pop(chan_id)
+        self.channels_by_node[channel.node1_pub].remove(channel)
+        self.channels_by_node[channel.node2_pub].remove(channel)
+        return channel
+
+    def find_route(self, target, amount_msat, last_hop_pubkey=None, outgoing_chan_id=0, ignored_nodes=(),
+                   ignored_pairs=(), fee_limit_msat=None, final_cltv_delta=FINAL_CLTV_DELTA):
+        # Dijkstra from the target back to our own node, as the fees depend on the amount forwarded downstream.
+        # Like lnd, the balances are only known for our own channels, all other channels are limited by capacity.
+        source = self.own_pubkey
+        ignored_nodes = set(ignored_nodes)
+        ignored_pairs = set(ignored_pairs)
+        best = {("target", target): 0}
+        # (fee, tie breaker, state, amount to be received in state, hops to the target)
+        queue = [(0, 0, ("target", target), amount_msat, [])]
+        counter = 0
+        while queue:
+            fee_msat, _, state, state_amount_msat, hops = heapq.heappop(queue)
+            kind, pub_key = state
+            if kind == "source":
+                if fee_limit_msat is not None and fee_msat > fee_limit_msat:
+                    return None
+                return self.build_route(hops, amount_msat, final_cltv_delta)
+            if best.get(state, fee_msat) < fee_msat:
+                continue
+            for channel in self.channels_by_node[pub_key]:
+                previous = channel.get_peer(pub_key)
+                if kind == "target" and last_hop_pubkey and previous != last_hop_pubkey:
+                    continue
+                if previous in ignored_nodes or (previous, pub_key) in ignored_pairs:
+                    continue
+                policy = channel.get_policy(previous)
+                if policy.disabled or state_amount_msat < policy.min_htlc:
+                    continue
+                if policy.max_htlc_msat and state_amount_msat > policy.max_htlc_msat:
+                    continue
+                if previous == source:
+                    if outgoing_chan_id and channel.chan_id != outgoing_chan_id:
+                        continue
+                    if channel.get_balance_msat(source) < state_amount_msat:
+                        continue
+                    next_state = ("source", source)
+                    next_fee_msat = fee_msat
+                else:
+                    if previous == target or channel.capacity * 1_000 < state_amount_msat:
+                        continue
+                    if any(previous == hop_pub_key for _, hop_pub_key in hops):
+                        continue
+                    next_state = ("node", previous)
+                    next_fee_msat = fee_msat + get_fee_msat(policy, state_amount_msat)
+                if next_fee_msat >= best.get(next_state, next_fee_msat + 1):
+                    continue
+                best[next_state] = next_fee_msat
+                counter += 1
+                next_amount_msat = state_amount_msat + next_fee_msat - fee_msat
+                heapq.heappush(
+                    queue, (next_fee_msat, counter, next_state, next_amount_msat, [(channel, pub_key)] + hops)
+                )
+        return None
+
+    def build_route(self, hops, amount_msat, final_cltv_delta):
+        # hops are (channel, node reached via channel), starting at our own node
+        route_hops = []
+        amount_to_forward_msat = amount_msat
+        expiry = BLOCK_HEIGHT + final_cltv_delta + BLOCK_PADDING
+        for i in reversed(range(len(hops))):
+            channel, pub_key = hops[i]
+            fee_msat = 0
+            time_lock_delta = 0
+            if i < len(hops) - 1:
+                policy = hops[i + 1][0].get_policy(pub_key)
+                fee_msat = get_fee_msat(policy, amount_to_forward_msat)
+                time_lock_delta = policy.time_lock_delta
+            route_hops.insert(0, ln.Hop(
+                chan_id=channel.chan_id,
+                chan_capacity=channel.capacity,
+                amt_to_forward=amount_to_forward_msat // 1_000,
+                amt_to_forward_msat=amount_to_forward_msat,
+                fee=fee_msat // 1_000,
+                fee_msat=fee_msat,
+                expiry=expiry,
+                pub_key=pub_key,
+                tlv_payload=True,
+            ))
+            amount_to_forward_msat += fee_msat
+            expiry += time_lock_delta
+        total_fees_msat = amount_to_forward_msat - amount_msat
+        return ln.Route(
+            total_time_lock=expiry,
+            total_fees=total_fees_msat // 1_000,
+            total_fees_msat=total_fees_msat,
+            total_amt=amount_to_forward_msat // 1_000,
+            total_amt_msat=amount_to_forward_msat,
+            hops=route_hops,
+        )
+
+
+def generate_graph(
+        node_count,
+        channel_count,
+        own_channel_count,
+        median_fee_rate=100,
+        fee_rate_spread=1.0,
+        seed=None,
+):
+    # fee rates follow a log-normal distribution, which resembles the fee rates seen on mainnet
+    rng = random.Random(seed)
+    pub_keys = [get_random_pubkey(rng) for _ in range(node_count)]
+    own_pubkey = pub_keys[0]
+    aliases = {pub_key: f"node-{i}" for i, pub_key in enumerate(pub_keys)}
+    aliases[own_pubkey] = "fake-lnd"
+
+    pairs = set()
+    # connect every node to the graph before adding random channels
+    for i in range(2, node_count):
+        pairs.add(get_pair(pub_keys[i], pub_keys[rng.randrange(1, i)]))
+    peers = rng.sample(pub_keys[1:], min(own_channel_count, node_count - 1))
+    for peer in peers:
+        pairs.add(get_pair(own_pubkey, peer))
+    attempts = 0
+    while len(pairs) < channel_count and attempts < channel_count * 10:
+        attempts += 1
+        node1 = pub_keys[rng.randrange(1, node_count)]
+        node2 = pub_keys[rng.randrange(1, node_count)]
+        if node1 != node2:
+            pairs.add(get_pair(node1, node2))
+
+    channels = []
+    for i, (node1, node2) in enumerate(sorted(pairs)):
+        capacity = rng.choice(CAPACITIES)
+        chan_id = (BLOCK_HEIGHT - rng.randrange(100_000)) << 40 | i << 16
+        channel_point = f"{rng.getrandbits(256):064x}:{rng.randrange(2)}"
+        channels.append(FakeChannel(
+            chan_id,
+            channel_point,
+            node1,
+            node2,
+            capacity,
+            rng.randrange(capacity + 1) * 1_000,
+            get_random_policy(rng, capacity, median_fee_rate, fee_rate_spread),
+            get_random_policy(rng, capacity, median_fee_rate, fee_rate_spread),
+        ))
+    return FakeGraph(own_pubkey, aliases, channels)
+
+
+def get_random_pubkey(rng):
+    return rng.choice(["02", "03"]) + f"{rng.getrandbits(256):064x}"
+
+
+def get_pair(node1, node2):
+    return min(node1, node2), max(node1, node2)
+
+
+def get_random_policy(rng, capacity, median_fee_rate, fee_rate_spread):
+    fee_rate = int(min(MAX_FEE_RATE, rng.lognormvariate(0, fee_rate_spread) * median_fee_rate))
+    return ln.RoutingPolicy(
+        time_lock_delta=TIME_LOCK_DELTA,
+        min_htlc=1_000,
+        fee_base_msat=rng.choice(BASE_FEES_MSAT),
+        fee_rate_milli_msat=fee_rate,
+        max_htlc_msat=capacity * 990,
+        last_update=int(time.time()),
+    )
+
+
+def get_fee_msat(policy, amount_msat):
+    return policy.fee_base_msat + amount_msat * policy.fee_rate_milli_msat // 1_000_000
+
+
+class FakeLnd:
+    def __init__(self, graph):
+        self.graph = graph
+        self.invoices = {}
+        self.payments = {}
+        self.mission_control = {}
+        # one queue per open subscription, updates are pushed using update_policy, close_channel, ...
+        self.graph_subscribers = []
+        self.channel_event_subscribers = []
+        self.inactive_channels = set()
+        self.lock = threading.Lock()
+
+    def get_channel(self, channel):
+        remote_pubkey = channel.get_peer(self.graph.own_pubkey)
+        local_balance_msat = channel.get_balance_msat(self.graph.own_pubkey)
+        return ln.Channel(
+            active=channel.chan_id not in self.inactive_channels,
+            remote_pubkey=remote_pubkey,
+            channel_point=channel.channel_point,
+            chan_id=channel.chan_id,
+            capacity=channel.capacity,
+            local_balance=local_balance_msat // 1_000,
+            remote_balance=channel.capacity - local_balance_msat // 1_000,
+            local_chan_reserve_sat=channel.capacity // 100,
+            remote_chan_reserve_sat=channel.capacity // 100,
+            peer_alias=self.graph.aliases[remote_pubkey],
+        )
+
+    def add_invoice(self, invoice):
+        preimage = os.urandom(32)
+        payment_hash = hashlib.sha256(preimage).digest()
+        payment_addr = os.urandom(32)
+        payment_request = f"lnfake{invoice.value}n1{payment_hash.hex()}"
+        with self.lock:
+            self.invoices[payment_hash] = {
+                "preimage": preimage,
+                "payment_addr": payment_addr,
+                "payment_request": payment_request,
+                "value_msat": invoice.value * 1_000 + invoice.value_msat,
+                "memo": invoice.memo,
+                "expiry": invoice.expiry or INVOICE_EXPIRY,
+                "cltv_expiry": invoice.cltv_expiry or FINAL_CLTV_DELTA,
+                "created": int(time.time()),
+                "state": "OPEN",
+            }
+            add_index = len(self.invoices)
+        return ln.AddInvoiceResponse(
+            r_hash=payment_hash, payment_request=payment_request, add_index=add_index, payment_addr=payment_addr
+        )
+
+    def decode_payment_request(self, payment_request):
+        for payment_hash, invoice in list(self.invoices.items()):
+            if invoice["payment_request"] == payment_request:
+                return ln.PayReq(
+                    destination=self.graph.own_pubkey,
+                    payment_hash=payment_hash.hex(),
+                    num_satoshis=invoice["value_msat"] // 1_000,
+                    num_msat=invoice["value_msat"],
+                    timestamp=invoice["created"],
+                    expiry=invoice["expiry"],
+                    description=invoice["memo"],
+                    cltv_expiry=invoice["cltv_expiry"],
+                    payment_addr=invoice["payment_addr"],
+                )
+        return None
+
+    def subscribe(self, subscribers, context):
+        updates = queue.Queue()
+        with self.lock:
+            subscribers.append(updates)
+        context.add_callback(lambda: updates.put(None))
+        try:
+            while True:
+                update = updates.get()
+                if update is None:
+                    return
+                yield update
+        finally:
+            with self.lock:
+                subscribers.remove(updates)
+
+    def publish(self, subscribers, update):
+        with self.lock:
+            subscribers = list(subscribers)
+        for updates in subscribers:
+            updates.put(update)
+
+    def update_policy(self, chan_id, advertising_node, policy):
+        with self.lock:
+            channel = self.graph.channels[chan_id]
+            if advertising_node == channel.node1_pub:
+                channel.node1_policy = policy
+            else:
+                channel.node2_policy = policy
+        self.publish(self.graph_subscribers, ln.GraphTopologyUpdate(channel_updates=[ln.ChannelEdgeUpdate(
+            chan_id=chan_id,
+            chan_point=get_channel_point(channel.channel_point),
+            capacity=channel.capacity,
+            routing_policy=policy,
+            advertising_node=advertising_node,
+            connecting_node=channel.get_peer(advertising_node),
+        )]))
+
+    def close_channel(self, chan_id):
+        with self.lock:
+            channel = self.graph.remove_channel(chan_id)
+        self.publish(self.graph_subscribers, ln.GraphTopologyUpdate(closed_chans=[ln.ClosedChannelUpdate(
+            chan_id=chan_id, capacity=channel.capacity, chan_point=get_channel_point(channel.channel_point)
+        )]))
+        if self.graph.own_pubkey in (channel.node1_pub, channel.node2_pub):
+            self.publish(self.channel_event_subscribers, ln.ChannelEventUpdate(
+                type=ln.ChannelEventUpdate.CLOSED_CHANNEL,
+                closed_channel=ln.ChannelCloseSummary(
+                    chan_id=chan_id,
+                    channel_point=channel.channel_point,
+                    remote_pubkey=channel.get_peer(self.graph.own_pubkey),
+                    capacity=channel.capacity,
+                ),
+            ))
+        return channel
+
+    def open_channel(self, peer, capacity, local_balance):
+        # the channel is confirmed in the next block, so that its ID does not collide with the generated channels
+        own_pubkey = self.graph.own_pubkey
+        node1_pub, node2_pub = get_pair(own_pubkey, peer)
+        node1_balance_msat = local_balance * 1_000 if node1_pub == own_pubkey else (capacity - local_balance) * 1_000
+        policy = ln.RoutingPolicy(
+            time_lock_delta=TIME_LOCK_DELTA, min_htlc=1_000, max_htlc_msat=capacity * 990, last_update=int(time.time())
+        )
+        with self.lock:
+            chan_id = (BLOCK_HEIGHT + 1) << 40 | len(self.graph.channels) << 16
+            channel = FakeChannel(
+                chan_id, f"{os.urandom(32).hex()}:0", node1_pub, node2_pub, capacity, node1_balance_msat, policy, policy
+            )
+            self.graph.add_channel(channel)
+            open_channel = self.get_channel(channel)
+        self.publish(self.channel_event_subscribers, ln.ChannelEventUpdate(
+            type=ln.ChannelEventUpdate.OPEN_CHANNEL, open_channel=open_channel
+        ))
+        return channel
+
+    def set_active(self, chan_id, active):
+        with self.lock:
+            channel = self.graph.channels[chan_id]
+            if active:
+                self.inactive_channels.discard(chan_id)
+            else:
+                self.inactive_channels.add(chan_id)
+        channel_point = get_channel_point(channel.channel_point)
+        if active:
+            update = ln.ChannelEventUpdate(type=ln.ChannelEventUpdate.ACTIVE_CHANNEL, active_channel=channel_point)
+        else:
+            update = ln.ChannelEventUpdate(type=ln.ChannelEventUpdate.INACTIVE_CHANNEL, inactive_channel=channel_point)
+        self.publish(self.channel_event_subscribers, update)
+
+    def cancel_invoice(self, payment_hash):
+        with self.lock:
+            invoice = self.invoices.get(payment_hash)
+            if invoice is None or invoice["state"] == "SETTLED":
+                return False
+            invoice["state"] = "CANCELED"
+            return True
+
+    def send_to_route(self, payment_hash, route):
+        # failure_source_index 0 is our own node, index i is the node of route.hops[i - 1]
+        with self.lock:
+            sender = self.graph.own_pubkey
+            channels = []
+            for i, hop in enumerate(route.hops):
+                channel = self.graph.channels.get(hop.chan_id)
+                if channel is None or sender not in (channel.node1_pub, channel.node2_pub) \
+                        or channel.get_peer(sender) != hop.pub_key:
+                    return get_failure(ln.Failure.UNKNOWN_NEXT_PEER, i)
+                policy = channel.get_policy(sender)
+                amount_msat = hop.amt_to_forward_msat + hop.fee_msat
+                if policy.disabled:
+                    return get_failure(ln.Failure.CHANNEL_DISABLED, i)
+                if i > 0:
+                    expected_fee_msat = get_fee_msat(policy, amount_msat)
+                    if route.hops[i - 1].fee_msat < expected_fee_msat:
+                        return get_failure(ln.Failure.FEE_INSUFFICIENT, i)
+                if channel.get_balance_msat(sender) < amount_msat:
+                    return get_failure(ln.Failure.TEMPORARY_CHANNEL_FAILURE, i)
+                channels.append((channel, sender, amount_msat))
+                sender = hop.pub_key
+            invoice = self.invoices.get(payment_hash)
+            if sender != self.graph.own_pubkey or invoice is None or invoice["state"] != "OPEN" \
+                    or route.hops[-1].amt_to_forward_msat < invoice["value_msat"] \
+                    or route.hops[-1].expiry < BLOCK_HEIGHT + invoice["cltv_expiry"]:
+                return get_failure(ln.Failure.INCORRECT_OR_UNKNOWN_PAYMENT_DETAILS, len(route.hops))
+            for channel, sender, amount_msat in channels:
+                channel.move_balance(sender, amount_msat)
+            invoice["state"] = "SETTLED"
+            return lnrouter.SendToRouteResponse(preimage=invoice["preimage"])
+
+
+    def send_to_route_v2(self, payment_hash, route):
+        response = self.send_to_route(payment_hash, route)
+        attempt = ln.HTLCAttempt(route=route, attempt_time_ns=time.time_ns(), resolve_time_ns=time.time_ns())
+        if response.HasField("failure"):
+            attempt.status = ln.HTLCAttempt.FAILED
+            attempt.failure.CopyFrom(response.failure)
+            self.record_failure(route, response.failure.failure_source_index)
+        else:
+            attempt.status = ln.HTLCAttempt.SUCCEEDED
+            attempt.preimage = response.preimage
+        with self.lock:
+            attempts = self.payments.setdefault(payment_hash, [])
+            attempt.attempt_id = len(attempts)
+            attempts.append(attempt)
+        return attempt
+
+    def record_failure(self, route, failure_source_index):
+        if failure_source_index >= len(route.hops):
+            return
+        hop = route.hops[failure_source_index]
+        if failure_source_index == 0:
+            node_from = self.graph.own_pubkey
+        else:
+            node_from = route.hops[failure_source_index - 1].pub_key
+        with self.lock:
+            self.mission_control[(node_from, hop.pub_key)] = lnrouter.PairData(
+                fail_time=int(time.time()), fail_amt_msat=hop.amt_to_forward_msat + hop.fee_msat
+            )
+
+    def query_mission_control(self):
+        with self.lock:
+            return lnrouter.QueryMissionControlResponse(pairs=[
+                lnrouter.PairHistory(
+                    node_from=bytes.fromhex(node_from), node_to=bytes.fromhex(node_to), history=history
+                )
+                for (node_from, node_to), history in self.mission_control.items()
+            ])
+
+    def import_mission_control(self, pairs):
+        with self.lock:
+            for pair in pairs:
+                self.mission_control[(pair.node_from.hex(), pair.node_to.hex())] = pair.history
+
+    def get_payment(self, payment_hash):
+        with self.lock:
+            attempts = self.payments.get(payment_hash)
+            if attempts is None:
+                return None
+            if attempts[-1].status == ln.HTLCAttempt.SUCCEEDED:
+                status = ln.Payment.SUCCEEDED
+            else:
+                status = ln.Payment.FAILED
+            return ln.Payment(payment_hash=payment_hash.hex(), status=status, htlcs=attempts)
+
+
+def get_channel_point(channel_point):
+    funding_txid, output_index = channel_point.split(":")
+    return ln.ChannelPoint(funding_txid_str=funding_txid, output_index=int(output_index))
+
+
+def get_failure(code, failure_source_index):
+    return lnrouter.SendToRouteResponse(failure=ln.Failure(code=code, failure_source_index=failure_source_index))
+
+
+class FakeLightning(lnrpc.LightningServicer):
+    def __init__(self, fake_lnd):
+        self.fake_lnd = fake_lnd
+        self.graph = fake_lnd.graph
+
+    def GetInfo(self, request, context):
+        return ln.GetInfoResponse(
+            identity_pubkey=self.graph.own_pubkey,
+            alias=self.graph.aliases[self.graph.own_pubkey],
+            num_active_channels=len(self.graph.get_own_channels()),
+            block_height=BLOCK_HEIGHT,
+            synced_to_chain=True,
+            synced_to_graph=True,
+        )
+
+    def ListChannels(self, request, context):
+        if request.private_only:
+            return ln.ListChannelsResponse()
+        peer = request.peer.hex()
+        with self.fake_lnd.lock:
+            channels = [
+                self.fake_lnd.get_channel(channel)
+                for channel in self.graph.get_own_channels()
+                if not peer or channel.get_peer(self.graph.own_pubkey) == peer
+            ]
+        return ln.ListChannelsResponse(channels=channels)
+
+    def GetChanInfo(self, request, context):
+        channel = self.graph.channels.get(request.chan_id)
+        if channel is None:
+            context.abort(grpc.StatusCode.UNKNOWN, "edge not found")
+        return channel.to_edge()
+
+    def GetNodeInfo(self, request, context):
+        alias = self.graph.aliases.get(request.pub_key)
+        if alias is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "unable to find node")
+        channels = self.graph.channels_by_node[request.pub_key]
+        return ln.NodeInfo(
+            node=ln.LightningNode(pub_key=request.pub_key, alias=alias),
+            num_channels=len(channels),
+            total_capacity=sum(channel.capacity for channel in channels),
+            channels=[channel.to_edge() for channel in channels] if request.include_channels else [],
+        )
+
+    def DescribeGraph(self, request, context):
+        return ln.ChannelGraph(
+            nodes=[ln.LightningNode(pub_key=pub_key, alias=alias) for pub_key, alias in self.graph.aliases.items()],
+            edges=[channel.to_edge() for channel in self.graph.channels.values()],
+        )
+
+    def FeeReport(self, request, context):
+        channel_fees = []
+        for channel in self.graph.get_own_channels():
+            policy = channel.get_policy(self.graph.own_pubkey)
+            channel_fees.append(ln.ChannelFeeReport(
+                chan_id=channel.chan_id,
+                channel_point=channel.channel_point,
+                base_fee_msat=policy.fee_base_msat,
+                fee_per_mil=policy.fee_rate_milli_msat,
+                fee_rate=policy.fee_rate_milli_msat / 1_000_000,
+            ))
+        return ln.FeeReportResponse(channel_fees=channel_fees)
+
+    def QueryRoutes(self, request, context):
+        amount_msat = request.amt_msat or request.amt * 1_000
+        fee_limit_msat = None
+        if request.fee_limit.HasField("fixed_msat"):
+            fee_limit_msat = request.fee_limit.fixed_msat
+        elif request.fee_limit.HasField("fixed"):
+            fee_limit_msat = request.fee_limit.fixed * 1_000
+        with self.fake_lnd.lock:
+            route = self.graph.find_route(
+                request.pub_key,
+                amount_msat,
+                request.last_hop_pubkey.hex(),
+                request.outgoing_chan_id,
+                [node.hex() for node in request.ignored_nodes],
+                [(getattr(pair, "from").hex(), pair.to.hex()) for pair in request.ignored_pairs],
+                fee_limit_msat,
+                request.final_cltv_delta or FINAL_CLTV_DELTA,
+            )
+        if route is None:
+            context.abort(grpc.StatusCode.UNKNOWN, "unable to find a path to destination")
+        return ln.QueryRoutesResponse(routes=[route], success_prob=0.5)
+
+    def AddInvoice(self, request, context):
+        return self.fake_lnd.add_invoice(request)
+
+    def DecodePayReq(self, request, context):
+        payment_request = self.fake_lnd.decode_payment_request(request.pay_req)
+        if payment_request is None:
+            context.abort(grpc.StatusCode.UNKNOWN, "invalid payment request")
+        return payment_request
+
+    def SubscribeChannelGraph(self, request, context):
+        return self.fake_lnd.subscribe(self.fake_lnd.graph_subscribers, context)
+
+    def SubscribeChannelEvents(self, request, context):
+        return self.fake_lnd.subscribe(self.fake_lnd.channel_event_subscribers, context)
+
+
+class FakeRouter(lnrouterrpc.RouterServicer):
+    def __init__(self, fake_lnd):
+        self.fake_lnd = fake_lnd
+
+    def SendToRoute(self, request, context):
+        return self.fake_lnd.send_to_route(request.payment_hash, request.route)
+
+    def SendToRouteV2(self, request, context):
+        return self.fake_lnd.send_to_route_v2(request.payment_hash, request.route)
+
+    def QueryMissionControl(self, request, context):
+        return self.fake_lnd.query_mission_control()
+
+    def XImportMissionControl(self, request, context):
+        self.fake_lnd.import_mission_control(request.pairs)
+        return lnrouter.XImportMissionControlResponse()
+
+    def TrackPaymentV2(self, request, context):
+        payment = self.fake_lnd.get_payment(request.payment_hash)
+        if payment is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "payment isn't initiated")
+        return iter([payment])
+
+
+class FakeInvoices(invoicesrpc.InvoicesServicer):
+    def __init__(self, fake_lnd):
+        self.fake_lnd = fake_lnd
+
+    def CancelInvoice(self, request, context):
+        if not self.fake_lnd.cancel_invoice(request.payment_hash):
+            context.abort(grpc.StatusCode.UNKNOWN, "unable to cancel invoice")
+        return invoices.CancelInvoiceResp()
+
+
+def create_lnd_dir(lnd_dir, network):
+    os.makedirs(lnd_dir, exist_ok=True)
+    # ECDSA, as Lnd only allows the corresponding cipher suites
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes",
+            "-days", "1", "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+            "-keyout", f"{lnd_dir}/tls.key", "-out", f"{lnd_dir}/tls.cert",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    macaroon_dir = f"{lnd_dir}/data/chain/bitcoin/{network}"
+    os.makedirs(macaroon_dir, exist_ok=True)
+    with open(f"{macaroon_dir}/admin.macaroon", "wb") as f:
+        f.write(os.urandom(32))
+
+
+def start_server(fake_lnd, lnd_dir, address="127.0.0.1:0"):
+    with open(f"{lnd_dir}/tls.key", "rb") as f:
+        private_key = f.read()
+    with open(f"{lnd_dir}/tls.cert", "rb") as f:
+        certificate = f.read()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_WORKERS))
+    lnrpc.add_LightningServicer_to_server(FakeLightning(fake_lnd), server)
+    lnrouterrpc.add_RouterServicer_to_server(FakeRouter(fake_lnd), server)
+    invoicesrpc.add_InvoicesServicer_to_server(FakeInvoices(fake_lnd), server)
+    port = server.add_secure_port(address, grpc.ssl_server_credentials([(private_key, certificate)]))
+    server.start()
+    return server, port
+
+
+def main():
+    arguments = get_argument_parser().parse_args()
+    graph = generate_graph(
+        arguments.nodes,
+        arguments.channels,
+        arguments.own_channels,
+        arguments.median_fee_rate,
+        arguments.fee_rate_spread,
+        arguments.seed,
+    )
+    lnd_dir = arguments.lnddir or tempfile.mkdtemp(prefix="fake-lnd-")
+    create_lnd_dir(lnd_dir, arguments.network)
+    server, port = start_server(FakeLnd(graph), lnd_dir, f"127.0.0.1:{arguments.port}")
+    print(f"Serving {len(graph.aliases):,} nodes and {len(graph.channels):,} channels "
+          f"({len(graph.get_own_channels()):,} own channels)")
+    print(f"Use: rebalance.py --lnddir {lnd_dir} --grpc localhost:{port} --network {arguments.network} ...")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(0)
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Serves a synthetic lightning network graph using the lnd gRPC interface"
+    )
+    parser.add_argument("--lnddir", help="directory for the generated TLS certificate and macaroon")
+    parser.add_argument("--network", default="mainnet")
+    parser.add_argument("--port", type=int, default=10009)
+    parser.add_argument("--nodes", type=int, default=1_000, help="number of nodes (default: 1,000)")
+    parser.add_argument("--channels", type=int, default=5_000, help="number of channels (default: 5,000)")
+    parser.add_argument(
+        "--own-channels", type=int, default=50, help="number of channels of the fake node (default: 50)"
+    )
+    parser.add_argument(
+        "--median-fee-rate", type=int, default=100, help="median fee rate in ppm (default: 100)"
+    )
+    parser.add_argument(
+        "--fee-rate-spread",
+        type=float,
+        default=1.0,
+        help="spread of the (log-normal) fee rate distribution (default: 1.0)",
+    )
+    parser.add_argument("--seed", type=int, help="seed for the random graph, for reproducible runs")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(main())
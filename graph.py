@@ -0,0 +1,83 @@
+import codecs
+from collections import defaultdict
+
+from grpc_generated import lightning_pb2 as ln
+
+
+class ChannelGraph:
+    def __init__(self, edges, nodes=()):
+        self.edges = {}
+        self.channels_by_node = defaultdict(set)
+        for edge in edges:
+            self.add_edge(edge)
+        self.aliases = {}
+        for node in nodes:
+            self.aliases[node.pub_key] = node.alias
+
+    def get_edge(self, channel_id):
+        return self.edges.get(channel_id)
+
+    def has_edge(self, channel_id):
+        return channel_id in self.edges
+
+    def add_edge(self, edge):
+        self.edges[edge.channel_id] = edge
+        self.channels_by_node[edge.node1_pub].add(edge.channel_id)
+        self.channels_by_node[edge.node2_pub].add(edge.channel_id)
+
+    def remove_edge(self, channel_id):
+        edge = self.edges.pop(channel_id, None)
+        if edge is not None:
+            self.channels_by_node[edge.node1_pub].discard(channel_id)
+            self.channels_by_node[edge.node2_pub].discard(channel_id)
+
+    def get_peers(self, pub_key):
+        peers = set()
+        # copied, as updates are applied in another thread
+        for channel_id in tuple(self.channels_by_node.get(pub_key, ())):
+            edge = self.edges.get(channel_id)
+            if edge is not None:
+                peers.add(edge.node2_pub if edge.node1_pub == pub_key else edge.node1_pub)
+        return peers
+
+    def get_alias(self, pub_key):
+        return self.aliases.get(pub_key)
+
+    def apply_update(self, graph_topology_update):
+        for node_update in graph_topology_update.node_updates:
+            self.aliases[node_update.identity_key] = node_update.alias
+        for channel_update in graph_topology_update.channel_updates:
+            self.apply_channel_update(channel_update)
+        for closed_channel in graph_topology_update.closed_chans:
+            self.remove_edge(closed_channel.chan_id)
+
+    def apply_channel_update(self, channel_update):
+        # edges are replaced instead of modified, so that readers in other threads never see partial updates
+        edge = ln.ChannelEdge()
+        existing_edge = self.edges.get(channel_update.chan_id)
+        if existing_edge is None:
+            # lnd sorts the nodes of a channel by their public key
+            node1_pub, node2_pub = sorted([channel_update.advertising_node, channel_update.connecting_node])
+            edge.channel_id = channel_update.chan_id
+            edge.chan_point = get_channel_point_string(channel_update.chan_point)
+            edge.node1_pub = node1_pub
+            edge.node2_pub = node2_pub
+        else:
+            edge.CopyFrom(existing_edge)
+        edge.capacity = channel_update.capacity
+        if channel_update.advertising_node == edge.node1_pub:
+            policy = edge.node1_policy
+        else:
+            policy = edge.node2_policy
+        if existing_edge is not None and policy.last_update > channel_update.routing_policy.last_update:
+            return
+        policy.CopyFrom(channel_update.routing_policy)
+        self.add_edge(edge)
+
+
+def get_channel_point_string(channel_point):
+    if channel_point.funding_txid_str:
+        funding_txid = channel_point.funding_txid_str
+    else:
+        funding_txid = codecs.encode(channel_point.funding_txid_bytes[::-1], "hex").decode()
+    return f"{funding_txid}:{channel_point.output_index}"
@@ -0,0 +1,43 @@
+import threading
+from collections import defaultdict, deque
+from concurrent import futures
+
+
+class InvoicePool:
+    # invoices are created in the background, so that they are ready once a route needs to be paid
+    def __init__(self, lnd):
+        self.lnd = lnd
+        self.executor = futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="invoice-pool")
+        self.pending = defaultdict(deque)
+        self.lock = threading.Lock()
+
+    def prepare(self, memo, amount, count=1):
+        with self.lock:
+            for _ in range(count):
+                self.pending[(memo, amount)].append(self.executor.submit(self.lnd.generate_invoice, memo, amount))
+
+    def get(self, memo, amount):
+        with self.lock:
+            pending = self.pending.get((memo, amount))
+            future = pending.popleft() if pending else None
+        if future is None:
+            return self.lnd.generate_invoice(memo, amount)
+        try:
+            return future.result()
+        except Exception:
+            return self.lnd.generate_invoice(memo, amount)
+
+    def close(self):
+        with self.lock:
+            unused = [future for pending in self.pending.values() for future in pending]
+            self.pending.clear()
+        for future in unused:
+            try:
+                payment_request = future.result()
+            except Exception:
+                continue
+            try:
+                self.lnd.cancel_invoice(payment_request.payment_hash)
+            except Exception:
+                print(f"Unable to cancel unused invoice {payment_request.payment_hash}")
+        self.executor.shutdown()
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+
+import grpc
+
+from rpc_stats import get_method_name
+
+RPC_CLASSES = {
+    "Lightning/GetChanInfo": "lookup",
+    "Lightning/GetNodeInfo": "lookup",
+    "Lightning/DescribeGraph": "lookup",
+    "Lightning/QueryRoutes": "routing",
+    "Router/SendToRoute": "payment",
+    "Router/SendToRouteV2": "payment",
+    "Lightning/AddInvoice": "payment",
+    "Invoices/CancelInvoice": "payment",
+}
+# requests per second, maximum burst (only used if enabled, see --rpc-rate)
+RATE_LIMITS = {
+    "lookup": (50, 100),
+    "routing": (10, 10),
+    "payment": (5, 5),
+    "other": (20, 20),
+}
+# cleaning up must be possible even if the budget is exhausted
+BUDGET_EXEMPT_METHODS = {"Invoices/CancelInvoice", "Router/QueryMissionControl"}
+MIN_CONCURRENCY = 1
+DECREASE_FACTOR = 0.5
+# a response is considered slow if it takes longer than twice the fastest response seen for the method
+LATENCY_TOLERANCE = 2.0
+MIN_SLOW_LATENCY = 0.05
+BASELINE_ADJUSTMENT = 0.05
+OVERLOAD_STATUS_CODES = {grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.StatusCode.DEADLINE_EXCEEDED}
+POLL_INTERVAL = 0.005
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # takes a token and returns the number of seconds to wait until it may be used
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+
+class ConcurrencyLimit:
+    # additive increase, multiplicative decrease (at most once for all requests sent before the last decrease)
+    def __init__(self, max_limit):
+        self.max_limit = max(MIN_CONCURRENCY, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.last_decrease = 0
+        self.baselines = {}
+        self.condition = threading.Condition()
+
+    def get_limit(self):
+        return int(self.limit)
+
+    def try_acquire(self):
+        with self.condition:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, method, start, overloaded):
+        latency = time.monotonic() - start
+        with self.condition:
+            self.in_flight -= 1
+            if overloaded or self.is_slow(method, latency):
+                if start > self.last_decrease:
+                    self.limit = max(MIN_CONCURRENCY, self.limit * DECREASE_FACTOR)
+                    self.last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def is_slow(self, method, latency):
+        baseline = self.baselines.get(method)
+        if baseline is None or latency < baseline:
+            self.baselines[method] = latency
+            return False
+        # let the baseline follow a permanent change of the latency
+        self.baselines[method] = baseline + (latency - baseline) * BASELINE_ADJUSTMENT
+        return latency > max(MIN_SLOW_LATENCY, baseline * LATENCY_TOLERANCE)
+
+
+class BudgetExceededError(Exception):
+    def __init__(self, budget):
+        super().__init__(f"Exceeded the budget of {budget:,} requests sent to lnd")
+
+
+class RpcLimiter:
+    def __init__(self, max_concurrency, budget=None, rate_limits=None):
+        self.buckets = {
+            rpc_class: TokenBucket(rate, burst) for rpc_class, (rate, burst) in (rate_limits or {}).items()
+        }
+        self.concurrency = ConcurrencyLimit(max_concurrency)
+        self.budget = budget
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def charge(self, method):
+        with self.lock:
+            if self.budget is not None and method not in BUDGET_EXEMPT_METHODS:
+                if self.used >= self.budget:
+                    raise BudgetExceededError(self.budget)
+            self.used += 1
+
+    def get_delay(self, method):
+        bucket = self.buckets.get(RPC_CLASSES.get(method, "other"))
+        if bucket is None:
+            return 0
+        return bucket.reserve()
+
+
+class RpcLimiterInterceptor(grpc.UnaryUnaryClientInterceptor):
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        self.limiter.charge(method)
+        delay = self.limiter.get_delay(method)
+        if delay > 0:
+            time.sleep(delay)
+        self.limiter.concurrency.acquire()
+        start = time.monotonic()
+        try:
+            outcome = continuation(client_call_details, request)
+        except Exception:
+            self.limiter.concurrency.release(method, start, False)
+            raise
+        outcome.add_done_callback(
+            lambda future: self.limiter.concurrency.release(method, start, is_overloaded(future.exception()))
+        )
+        return outcome
+
+
+class AsyncRpcLimiterInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        try:
+            self.limiter.charge(method)
+        except BudgetExceededError as e:
+            # other exceptions break the call objects of grpc.aio
+            raise grpc.aio.AioRpcError(
+                grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.aio.Metadata(), grpc.aio.Metadata(), str(e)
+            )
+        delay = self.limiter.get_delay(method)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # the limit is shared with threads, which cannot notify the event loop
+        while not self.limiter.concurrency.try_acquire():
+            await asyncio.sleep(POLL_INTERVAL)
+        start = time.monotonic()
+        try:
+            response = await (await continuation(client_call_details, request))
+        except grpc.RpcError as e:
+            self.limiter.concurrency.release(method, start, is_overloaded(e))
+            raise
+        except BaseException:
+            self.limiter.concurrency.release(method, start, False)
+            raise
+        self.limiter.concurrency.release(method, start, False)
+        return response
+
+
+def is_overloaded(exception):
+    return isinstance(exception, grpc.RpcError) and hasattr(exception, "code") \
+        and exception.code() in OVERLOAD_STATUS_CODES
@@ -1,11 +1,24 @@
+import asyncio
 import base64
 import codecs
 import os
-from functools import lru_cache
+import threading
+import time
 from os.path import expanduser
 
 import grpc
 
+from cache import Cache, cache_key, cached
+from channels import ChannelTracker
+from defaults import MAX_CONCURRENT_REQUESTS
+from graph import ChannelGraph
+from limiter import RATE_LIMITS, RpcLimiter, RpcLimiterInterceptor, AsyncRpcLimiterInterceptor
+from payment_attempt import PaymentAttempt
+from recording import Recorder, RecordingInterceptor, AsyncRecordingInterceptor, ReplayChannel
+from resilience import ResilienceInterceptor, AsyncResilienceInterceptor, is_transient
+from route_engine import RouteEngine
+from rpc_stats import RpcStatistics, RpcStatisticsInterceptor, AsyncRpcStatisticsInterceptor
+
 from grpc_generated import router_pb2 as lnrouter
 from grpc_generated import router_pb2_grpc as lnrouterrpc
 from grpc_generated import lightning_pb2 as ln
@@ -14,11 +27,98 @@ from grpc_generated import invoices_pb2 as invoices
 from grpc_generated import invoices_pb2_grpc as invoicesrpc
 
 MESSAGE_SIZE_MB = 50 * 1024 * 1024
+# set explicitly, so that the payment request does not need to be decoded to learn these values (lnd's defaults)
+INVOICE_EXPIRY = 24 * 60 * 60
+INVOICE_CLTV_EXPIRY = 80
+CACHE_SETTINGS = {
+    # method name: (maximum number of entries, time to live in seconds)
+    "get_info": (1, 10 * 60),
+    "get_node_alias": (100_000, 7 * 24 * 60 * 60),
+    "get_edge": (10_000, 10 * 60),
+    "get_channel_snapshot": (1, 60),
+    "get_peer_channels": (100, 60),
+    "get_max_channel_capacity": (1, 60),
+    "is_zombie": (10_000, 10 * 60),
+    "get_own_policies": (1, 10 * 60),
+}
 
 
 class Lnd:
-    def __init__(self, lnd_dir, server, network):
+    def __init__(
+        self,
+        lnd_dir,
+        server,
+        network,
+        graph_snapshot=False,
+        concurrency=MAX_CONCURRENT_REQUESTS,
+        disk_cache=None,
+        cache_settings=None,
+        record_file=None,
+        replay_file=None,
+        hedge_reads=False,
+        rpc_budget=None,
+        local_routes=False,
+        rate_limit=False,
+    ):
         os.environ["GRPC_SSL_CIPHER_SUITES"] = "HIGH+ECDSA"
+        self.lnd_dir = self.get_lnd_dir(lnd_dir)
+        self.server = server
+        self.network = network
+        self.concurrency = concurrency
+
+        if replay_file:
+            grpc_channel = ReplayChannel(replay_file)
+            # the parallel lookups use a separate connection, which cannot be replayed
+            self.concurrency = 1
+        else:
+            combined_credentials = self.get_credentials(self.lnd_dir, network)
+            grpc_channel = grpc.secure_channel(
+                server, combined_credentials, self.get_channel_options()
+            )
+        self.rpc_statistics = RpcStatistics()
+        # shared by the sync and the async requests, so that lnd is protected from the sum of both
+        self.rpc_limiter = RpcLimiter(self.concurrency, rpc_budget, RATE_LIMITS if rate_limit else None)
+        # retries are sent through the remaining interceptors, so that each attempt is counted and recorded
+        interceptors = [
+            RpcLimiterInterceptor(self.rpc_limiter),
+            ResilienceInterceptor(self.rpc_statistics, hedge_reads),
+            RpcStatisticsInterceptor(self.rpc_statistics),
+        ]
+        self.async_interceptors = [
+            AsyncRpcLimiterInterceptor(self.rpc_limiter),
+            AsyncResilienceInterceptor(self.rpc_statistics, hedge_reads),
+            AsyncRpcStatisticsInterceptor(self.rpc_statistics),
+        ]
+        if record_file:
+            recorder = Recorder(record_file)
+            interceptors.append(RecordingInterceptor(recorder))
+            self.async_interceptors.append(AsyncRecordingInterceptor(recorder))
+        grpc_channel = grpc.intercept_channel(grpc_channel, *interceptors)
+        self.stub = lnrpc.LightningStub(grpc_channel)
+        self.router_stub = lnrouterrpc.RouterStub(grpc_channel)
+        self.invoices_stub = invoicesrpc.InvoicesStub(grpc_channel)
+        # the local route engine needs the whole graph
+        self.graph_snapshot = graph_snapshot or local_routes
+        self.local_routes = local_routes
+        self.graph = None
+        self.route_engine = None
+        self.graph_updates = None
+        self.graph_updates_thread = None
+        self.channel_tracker = None
+        self.channel_events = None
+        self.channel_events_thread = None
+        settings = dict(CACHE_SETTINGS)
+        settings.update(cache_settings or {})
+        self.caches = {name: Cache(max_size, ttl) for name, (max_size, ttl) in settings.items()}
+        self.edges = self.caches["get_edge"]
+        self.aliases = self.caches["get_node_alias"]
+        self.disk_cache = disk_cache
+        self.async_lnd = None
+        self.async_loop = None
+        self.async_lock = threading.Lock()
+
+    @staticmethod
+    def get_lnd_dir(lnd_dir):
         if lnd_dir == "_DEFAULT_":
             lnd_dir = "~/.lnd"
             lnd_dir2 = "~/umbrel/lnd"
@@ -30,20 +130,15 @@ class Lnd:
                 lnd_dir = lnd_dir2
             if not os.path.isdir(lnd_dir) and os.path.isdir(lnd_dir3):
                 lnd_dir = lnd_dir3
-        else:
-            lnd_dir = expanduser(lnd_dir)
+            return lnd_dir
+        return expanduser(lnd_dir)
 
-        combined_credentials = self.get_credentials(lnd_dir, network)
-        channel_options = [
+    @staticmethod
+    def get_channel_options():
+        return [
             ("grpc.max_message_length", MESSAGE_SIZE_MB),
             ("grpc.max_receive_message_length", MESSAGE_SIZE_MB),
         ]
-        grpc_channel = grpc.secure_channel(
-            server, combined_credentials, channel_options
-        )
-        self.stub = lnrpc.LightningStub(grpc_channel)
-        self.router_stub = lnrouterrpc.RouterStub(grpc_channel)
-        self.invoices_stub = invoicesrpc.InvoicesStub(grpc_channel)
 
     @staticmethod
     def get_credentials(lnd_dir, network):
@@ -60,26 +155,145 @@ class Lnd:
         )
         return combined_credentials
 
-    @lru_cache(maxsize=None)
+    def get_rpc_statistics(self):
+        return self.rpc_statistics
+
+    def get_cache_statistics(self):
+        return {name: (cache.hits, cache.misses, len(cache)) for name, cache in self.caches.items()}
+
+    def invalidate_channels(self):
+        self.caches["get_channel_snapshot"].clear()
+        self.caches["get_peer_channels"].clear()
+        self.caches["get_max_channel_capacity"].clear()
+
+    @cached("get_info")
     def get_info(self):
         return self.stub.GetInfo(ln.GetInfoRequest())
 
-    @lru_cache(maxsize=None)
     def get_node_alias(self, pub_key):
-        return self.stub.GetNodeInfo(
-            ln.NodeInfoRequest(pub_key=pub_key, include_channels=False)
-        ).node.alias
+        if self.graph is not None and self.graph.get_alias(pub_key) is not None:
+            return self.graph.get_alias(pub_key)
+        if pub_key not in self.aliases:
+            self.load_cached_aliases([pub_key])
+        alias = self.aliases.get(pub_key)
+        if alias is None:
+            alias = self.stub.GetNodeInfo(
+                ln.NodeInfoRequest(pub_key=pub_key, include_channels=False)
+            ).node.alias
+            self.store_aliases({pub_key: alias})
+        return alias
+
+    def prefetch_node_aliases(self, pub_keys):
+        graph = self.get_graph()
+        if graph is not None:
+            pub_keys = [pub_key for pub_key in pub_keys if graph.get_alias(pub_key) is None]
+        self.load_cached_aliases({pub_key for pub_key in pub_keys if pub_key not in self.aliases})
+        missing = {pub_key for pub_key in pub_keys if pub_key not in self.aliases}
+        if len(missing) < 2 or self.concurrency <= 1:
+            return
+        self.store_aliases(self.run_async(lambda async_lnd: async_lnd.get_node_aliases(missing)))
+
+    def prefetch_edges(self, channel_ids):
+        if self.get_graph() is not None:
+            return
+        self.load_cached_edges({channel_id for channel_id in channel_ids if channel_id not in self.edges})
+        missing = {channel_id for channel_id in channel_ids if channel_id not in self.edges}
+        if len(missing) < 2 or self.concurrency <= 1:
+            return
+        self.store_edges(self.run_async(lambda async_lnd: async_lnd.get_edges(missing)))
+
+    def load_cached_aliases(self, pub_keys):
+        if self.disk_cache is None or not pub_keys:
+            return
+        self.aliases.update(self.disk_cache.get_many("alias", pub_keys))
+
+    def store_aliases(self, aliases):
+        self.aliases.update(aliases)
+        if self.disk_cache is not None:
+            self.disk_cache.put_many("alias", aliases)
+
+    def load_cached_edges(self, channel_ids):
+        if self.disk_cache is None or not channel_ids:
+            return
+        for channel_id, value in self.disk_cache.get_many("edge", channel_ids).items():
+            self.edges.put(channel_id, ln.ChannelEdge.FromString(value))
+
+    def store_edges(self, edges):
+        self.edges.update(edges)
+        if self.disk_cache is not None:
+            self.disk_cache.put_many("edge", {channel_id: edge.SerializeToString() for channel_id, edge in edges.items()})
+
+    def invalidate_edge(self, channel_id):
+        self.edges.invalidate(channel_id)
+        self.caches["is_zombie"].invalidate(cache_key(channel_id))
+        if self.graph is not None:
+            self.graph.remove_edge(channel_id)
+        if self.disk_cache is not None:
+            self.disk_cache.invalidate("edge", channel_id)
+
+    def run_async(self, function):
+        # the event loop and the connection are kept, so that each batch does not need a new TLS handshake
+        with self.async_lock:
+            if self.async_lnd is None:
+                self.async_loop = asyncio.new_event_loop()
+                self.async_lnd = self.async_loop.run_until_complete(self.create_async_lnd())
+            return self.async_loop.run_until_complete(function(self.async_lnd))
+
+    async def create_async_lnd(self):
+        # imported here, as lnd_async itself depends on this module
+        from lnd_async import AsyncLnd
+
+        return AsyncLnd(self.lnd_dir, self.server, self.network, self.concurrency, self.async_interceptors)
+
+    def close_async(self):
+        with self.async_lock:
+            if self.async_lnd is None:
+                return
+            self.async_loop.run_until_complete(self.async_lnd.close())
+            self.async_loop.close()
+            self.async_lnd = None
+            self.async_loop = None
 
     def get_own_pubkey(self):
         return self.get_info().identity_pubkey
 
+    def get_block_height(self):
+        # not cached, as a new block is found every few minutes
+        return self.stub.GetInfo(ln.GetInfoRequest()).block_height
+
     def generate_invoice(self, memo, amount):
-        invoice_request = ln.Invoice(
+        invoice_request = self.get_invoice_request(memo, amount)
+        add_invoice_response = self.stub.AddInvoice(invoice_request)
+        payment_request = self.get_payment_request(self.get_own_pubkey(), invoice_request, add_invoice_response)
+        if payment_request is None:
+            return self.decode_payment_request(add_invoice_response.payment_request)
+        return payment_request
+
+    @staticmethod
+    def get_invoice_request(memo, amount):
+        return ln.Invoice(
             memo=memo,
             value=amount,
+            expiry=INVOICE_EXPIRY,
+            cltv_expiry=INVOICE_CLTV_EXPIRY,
+        )
+
+    @staticmethod
+    def get_payment_request(own_pubkey, invoice_request, add_invoice_response):
+        # everything needed to pay the invoice is known already, so that it does not need to be decoded by lnd
+        if not add_invoice_response.payment_addr:
+            return None
+        return ln.PayReq(
+            destination=own_pubkey,
+            payment_hash=add_invoice_response.r_hash.hex(),
+            num_satoshis=invoice_request.value,
+            num_msat=invoice_request.value * 1_000,
+            timestamp=int(time.time()),
+            expiry=invoice_request.expiry,
+            description=invoice_request.memo,
+            cltv_expiry=invoice_request.cltv_expiry,
+            payment_addr=add_invoice_response.payment_addr,
         )
-        add_invoice_response = self.stub.AddInvoice(invoice_request)
-        return self.decode_payment_request(add_invoice_response.payment_request)
 
     def cancel_invoice(self, payment_hash):
         payment_hash_bytes = self.hex_string_to_bytes(payment_hash)
@@ -91,12 +305,79 @@ class Lnd:
         )
         return self.stub.DecodePayReq(request)
 
-    @lru_cache(maxsize=None)
     def get_channels(self, active_only=False, public_only=False, private_only=False):
-        channels = self.stub.ListChannels(ln.ListChannelsRequest(active_only=active_only,public_only=public_only,private_only=private_only)).channels
+        return self.get_channel_tracker().get_channels(active_only, public_only, private_only)
+
+    def get_channel_tracker(self):
+        if self.channel_tracker is not None:
+            return self.channel_tracker
+        return self.get_channel_snapshot()
+
+    def get_loaded_channel_tracker(self):
+        if self.channel_tracker is not None:
+            return self.channel_tracker
+        return self.caches["get_channel_snapshot"].get(cache_key())
+
+    @cached("get_channel_snapshot")
+    def get_channel_snapshot(self):
+        # all channels are loaded once, the filtered views are computed from this snapshot
+        return ChannelTracker(self.fetch_channels())
+
+    def get_channel(self, channel_id, clear_cache_if_not_found=True):
+        if self.channel_tracker is not None:
+            return self.channel_tracker.get_channel(channel_id)
+        if self.get_loaded_channel_tracker() is None:
+            # avoid loading (and checking) all channels if only some of them are needed
+            channel = self.fetch_channel(channel_id)
+            if channel is not None:
+                return channel
+        channel = self.get_channel_snapshot().get_channel(channel_id)
+        if channel is not None:
+            return channel
+        if clear_cache_if_not_found:
+            self.invalidate_channels()
+            return self.get_channel(channel_id, clear_cache_if_not_found=False)
+        return None
+
+    def fetch_channel(self, channel_id):
+        try:
+            edge = self.get_edge(channel_id)
+        except grpc.RpcError:
+            return None
+        own_pubkey = self.get_own_pubkey()
+        if edge.node1_pub == own_pubkey:
+            peer = edge.node2_pub
+        elif edge.node2_pub == own_pubkey:
+            peer = edge.node1_pub
+        else:
+            return None
+        for channel in self.get_peer_channels(peer):
+            if channel.chan_id == channel_id:
+                return channel
+        return None
+
+    def get_peer_channels(self, peer):
+        channel_tracker = self.get_loaded_channel_tracker()
+        if channel_tracker is not None:
+            return channel_tracker.get_peer_channels(peer)
+        return self.fetch_peer_channels(peer)
+
+    @cached("get_peer_channels")
+    def fetch_peer_channels(self, peer):
+        return self.stub.ListChannels(ln.ListChannelsRequest(peer=bytes.fromhex(peer))).channels
+
+    def record_payment(self, route):
+        channel_tracker = self.get_loaded_channel_tracker()
+        if channel_tracker is not None:
+            channel_tracker.apply_route(route)
+        self.caches["get_peer_channels"].clear()
+
+    def fetch_channels(self):
+        channels = self.stub.ListChannels(ln.ListChannelsRequest()).channels
+        self.prefetch_edges([c.chan_id for c in channels])
         return [c for c in channels if self.is_zombie(c.chan_id) is False]
 
-    @lru_cache(maxsize=None)
+    @cached("get_max_channel_capacity")
     def get_max_channel_capacity(self):
         max_channel_capacity = 0
         for channel in self.get_channels(active_only=False):
@@ -112,6 +393,39 @@ class Lnd:
         ignored_nodes,
         first_hop_channel_id,
         fee_limit_msat,
+    ):
+        request = self.get_route_request(
+            self.get_own_pubkey(),
+            pub_key,
+            amount,
+            ignored_pairs,
+            ignored_nodes,
+            first_hop_channel_id,
+            fee_limit_msat,
+        )
+        return self.query_routes(request)
+
+    def query_routes(self, request):
+        try:
+            response = self.stub.QueryRoutes(request)
+            return response.routes
+        except grpc.RpcError as e:
+            # lnd reports that no route could be found as an error
+            if is_transient(e):
+                print(f"Unable to query routes: {e.details()}")
+                raise
+            return None
+
+    @staticmethod
+    def get_route_request(
+        own_pubkey,
+        pub_key,
+        amount,
+        ignored_pairs,
+        ignored_nodes,
+        first_hop_channel_id,
+        fee_limit_msat,
+        final_cltv_delta=0,
     ):
         if fee_limit_msat:
             fee_limit = {"fixed_msat": int(fee_limit_msat)}
@@ -121,8 +435,8 @@ class Lnd:
             last_hop_pubkey = base64.b16decode(pub_key, True)
         else:
             last_hop_pubkey = None
-        request = ln.QueryRoutesRequest(
-            pub_key=self.get_own_pubkey(),
+        return ln.QueryRoutesRequest(
+            pub_key=own_pubkey,
             last_hop_pubkey=last_hop_pubkey,
             amt=amount,
             ignored_pairs=ignored_pairs,
@@ -130,23 +444,113 @@ class Lnd:
             ignored_nodes=ignored_nodes,
             use_mission_control=True,
             outgoing_chan_id=first_hop_channel_id,
+            final_cltv_delta=final_cltv_delta,
             time_pref=-1
         )
-        try:
-            response = self.stub.QueryRoutes(request)
-            return response.routes
-        except:
-            return None
 
-    @lru_cache(maxsize=None)
+    def get_graph(self):
+        if self.graph is None and self.graph_snapshot:
+            response = self.stub.DescribeGraph(ln.ChannelGraphRequest(include_unannounced=True))
+            self.graph = ChannelGraph(response.edges, response.nodes)
+        return self.graph
+
+    def get_route_engine(self):
+        if self.route_engine is None and self.local_routes:
+            self.route_engine = RouteEngine(self.get_graph(), self.get_own_pubkey())
+        return self.route_engine
+
+    def subscribe_channel_graph(self):
+        if self.graph_updates is not None:
+            return
+        # subscribe before loading the snapshot, so that no update is missed in between
+        self.graph_updates = self.stub.SubscribeChannelGraph(ln.GraphTopologySubscription())
+        self.graph_snapshot = True
+        graph = self.get_graph()
+        self.graph_updates_thread = self.start_applying_updates(
+            self.graph_updates, graph.apply_update, "channel graph updates"
+        )
+
+    def unsubscribe_channel_graph(self):
+        if self.graph_updates is not None:
+            self.graph_updates.cancel()
+            self.graph_updates_thread.join()
+            self.graph_updates = None
+            self.graph_updates_thread = None
+
+    def subscribe_channel_events(self):
+        if self.channel_events is not None:
+            return
+        # subscribe before loading the channels, so that no event is missed in between
+        self.channel_events = self.stub.SubscribeChannelEvents(ln.ChannelEventSubscription())
+        self.channel_tracker = ChannelTracker(self.fetch_channels())
+        self.channel_events_thread = self.start_applying_updates(
+            self.channel_events, self.channel_tracker.apply_event, "channel events"
+        )
+
+    def unsubscribe_channel_events(self):
+        if self.channel_events is not None:
+            self.channel_events.cancel()
+            self.channel_events_thread.join()
+            self.channel_events = None
+            self.channel_events_thread = None
+            self.channel_tracker = None
+
+    @staticmethod
+    def start_applying_updates(updates, apply_update, description):
+        def run():
+            try:
+                for update in updates:
+                    apply_update(update)
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.CANCELLED:
+                    print(f"Stopped receiving {description}: {e.details()}")
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
     def get_edge(self, channel_id):
+        graph = self.get_graph()
+        if graph is None:
+            return self.fetch_edge(channel_id)
+        edge = graph.get_edge(channel_id)
+        if edge is None:
+            return self.fetch_edge(channel_id)
+        return edge
+
+    def fetch_edge(self, channel_id):
+        if channel_id not in self.edges:
+            self.load_cached_edges([channel_id])
+        edge = self.edges.get(channel_id)
+        if edge is None:
+            try:
+                edge = self.stub.GetChanInfo(ln.ChanInfoRequest(chan_id=channel_id))
+            except Exception:
+                print(f"Unable to find channel edge {channel_id}")
+                raise
+            self.store_edges({channel_id: edge})
+        return edge
+
+    @cached("get_own_policies")
+    def get_own_policies(self):
+        # the policies only contain the fee settings, which is all we need for our own channels
+        policies = {}
         try:
-            return self.stub.GetChanInfo(ln.ChanInfoRequest(chan_id=channel_id))
-        except Exception:
-            print(f"Unable to find channel edge {channel_id}")
-            raise
+            response = self.stub.FeeReport(ln.FeeReportRequest())
+        except grpc.RpcError:
+            return policies
+        for channel_fee_report in response.channel_fees:
+            policies[channel_fee_report.chan_id] = ln.RoutingPolicy(
+                fee_base_msat=channel_fee_report.base_fee_msat,
+                fee_rate_milli_msat=channel_fee_report.fee_per_mil,
+                inbound_fee_base_msat=channel_fee_report.inbound_base_fee_msat,
+                inbound_fee_rate_milli_msat=channel_fee_report.inbound_fee_per_mil,
+            )
+        return policies
 
     def get_policy_to(self, channel_id):
+        policy = self.get_own_policies().get(channel_id)
+        if policy is not None:
+            return policy
         edge = self.get_edge(channel_id)
         # node1_policy contains the fee base and rate for payments from node1 to node2
         if edge.node1_pub == self.get_own_pubkey():
@@ -167,23 +571,43 @@ class Lnd:
         return self.get_policy_from(channel_id).fee_rate_milli_msat
 
     def send_payment(self, payment_request, route):
+        return self.start_payment(payment_request, route).result()
+
+    def start_payment(self, payment_request, route):
+        # returns once the HTLC was handed to lnd, the attempt resolves once it settles or fails
+        request = self.get_send_to_route_request(payment_request, route)
+        return PaymentAttempt(self, request.payment_hash, self.router_stub.SendToRouteV2.future(request))
+
+    def track_payment(self, payment_hash):
+        return self.router_stub.TrackPaymentV2(
+            lnrouter.TrackPaymentRequest(payment_hash=payment_hash, no_inflight_updates=True)
+        )
+
+    @staticmethod
+    def get_send_to_route_request(payment_request, route):
         last_hop = route.hops[-1]
         last_hop.mpp_record.payment_addr = payment_request.payment_addr
         last_hop.mpp_record.total_amt_msat = payment_request.num_msat
         request = lnrouter.SendToRouteRequest(route=route)
-        request.payment_hash = self.hex_string_to_bytes(payment_request.payment_hash)
-        return self.router_stub.SendToRoute(request)
+        request.payment_hash = Lnd.hex_string_to_bytes(payment_request.payment_hash)
+        return request
+
+    def query_mission_control(self):
+        return self.router_stub.QueryMissionControl(lnrouter.QueryMissionControlRequest()).pairs
+
+    def import_mission_control(self, pairs):
+        self.router_stub.XImportMissionControl(lnrouter.XImportMissionControlRequest(pairs=pairs))
 
     @staticmethod
     def hex_string_to_bytes(hex_string):
         decode_hex = codecs.getdecoder("hex_codec")
         return decode_hex(hex_string)[0]
 
-    @lru_cache(maxsize=None)
+    @cached("is_zombie")
     def is_zombie(self, channel_id):
         try:
             self.get_edge(channel_id)
-        except:
+        except grpc.RpcError:
             print(f"Unable to load channel {channel_id}!")
             return True
         return False
@@ -0,0 +1,187 @@
+import asyncio
+
+import grpc
+
+from lnd import Lnd, MAX_CONCURRENT_REQUESTS
+from resilience import is_transient
+
+from grpc_generated import router_pb2_grpc as lnrouterrpc
+from grpc_generated import lightning_pb2 as ln
+from grpc_generated import lightning_pb2_grpc as lnrpc
+from grpc_generated import invoices_pb2 as invoices
+from grpc_generated import invoices_pb2_grpc as invoicesrpc
+
+
+class AsyncLnd:
+    def __init__(self, lnd_dir, server, network, concurrency=MAX_CONCURRENT_REQUESTS, interceptors=()):
+        lnd_dir = Lnd.get_lnd_dir(lnd_dir)
+        combined_credentials = Lnd.get_credentials(lnd_dir, network)
+        self.grpc_channel = grpc.aio.secure_channel(
+            server, combined_credentials, Lnd.get_channel_options(), interceptors=list(interceptors)
+        )
+        self.stub = lnrpc.LightningStub(self.grpc_channel)
+        self.router_stub = lnrouterrpc.RouterStub(self.grpc_channel)
+        self.invoices_stub = invoicesrpc.InvoicesStub(self.grpc_channel)
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.info = None
+        self.edges = {}
+        self.aliases = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        await self.grpc_channel.close()
+
+    async def run_bounded(self, function, arguments):
+        async def run(argument):
+            async with self.semaphore:
+                return await function(argument)
+        return await asyncio.gather(*[run(argument) for argument in arguments], return_exceptions=True)
+
+    async def get_info(self):
+        if self.info is None:
+            self.info = await self.stub.GetInfo(ln.GetInfoRequest())
+        return self.info
+
+    async def get_node_alias(self, pub_key):
+        alias = self.aliases.get(pub_key)
+        if alias is None:
+            alias = await self.fetch_node_alias(pub_key)
+            self.aliases[pub_key] = alias
+        return alias
+
+    async def fetch_node_alias(self, pub_key):
+        response = await self.stub.GetNodeInfo(
+            ln.NodeInfoRequest(pub_key=pub_key, include_channels=False)
+        )
+        return response.node.alias
+
+    async def get_node_aliases(self, pub_keys):
+        # not cached here, the caller keeps (and expires) the results
+        pub_keys = list(pub_keys)
+        results = await self.run_bounded(self.fetch_node_alias, pub_keys)
+        return {
+            pub_key: alias for pub_key, alias in zip(pub_keys, results) if not isinstance(alias, Exception)
+        }
+
+    async def get_own_pubkey(self):
+        info = await self.get_info()
+        return info.identity_pubkey
+
+    async def generate_invoice(self, memo, amount):
+        invoice_request = Lnd.get_invoice_request(memo, amount)
+        add_invoice_response = await self.stub.AddInvoice(invoice_request)
+        payment_request = Lnd.get_payment_request(await self.get_own_pubkey(), invoice_request, add_invoice_response)
+        if payment_request is None:
+            return await self.decode_payment_request(add_invoice_response.payment_request)
+        return payment_request
+
+    async def cancel_invoice(self, payment_hash):
+        payment_hash_bytes = Lnd.hex_string_to_bytes(payment_hash)
+        return await self.invoices_stub.CancelInvoice(invoices.CancelInvoiceMsg(payment_hash=payment_hash_bytes))
+
+    async def decode_payment_request(self, payment_request):
+        request = ln.PayReqString(
+            pay_req=payment_request,
+        )
+        return await self.stub.DecodePayReq(request)
+
+    async def get_channels(self, active_only=False, public_only=False, private_only=False):
+        response = await self.stub.ListChannels(
+            ln.ListChannelsRequest(active_only=active_only, public_only=public_only, private_only=private_only)
+        )
+        edges = await self.get_edges([c.chan_id for c in response.channels])
+        channels = []
+        for channel in response.channels:
+            if channel.chan_id in edges:
+                channels.append(channel)
+            else:
+                print(f"Unable to load channel {channel.chan_id}!")
+        return channels
+
+    async def get_route(
+        self,
+        pub_key,
+        amount,
+        ignored_pairs,
+        ignored_nodes,
+        first_hop_channel_id,
+        fee_limit_msat,
+    ):
+        request = Lnd.get_route_request(
+            await self.get_own_pubkey(),
+            pub_key,
+            amount,
+            ignored_pairs,
+            ignored_nodes,
+            first_hop_channel_id,
+            fee_limit_msat,
+        )
+        try:
+            response = await self.stub.QueryRoutes(request)
+            return response.routes
+        except grpc.RpcError as e:
+            # lnd reports that no route could be found as an error
+            if is_transient(e):
+                print(f"Unable to query routes: {e.details()}")
+                raise
+            return None
+
+    async def fetch_edge(self, channel_id):
+        return await self.stub.GetChanInfo(ln.ChanInfoRequest(chan_id=channel_id))
+
+    async def get_edge(self, channel_id):
+        edge = self.edges.get(channel_id)
+        if edge is None:
+            try:
+                edge = await self.fetch_edge(channel_id)
+            except Exception:
+                print(f"Unable to find channel edge {channel_id}")
+                raise
+            self.edges[channel_id] = edge
+        return edge
+
+    async def get_edges(self, channel_ids):
+        # not cached here, the caller keeps (and invalidates) the results
+        channel_ids = list(channel_ids)
+        results = await self.run_bounded(self.fetch_edge, channel_ids)
+        return {
+            channel_id: edge for channel_id, edge in zip(channel_ids, results) if not isinstance(edge, Exception)
+        }
+
+    async def get_policy_to(self, channel_id):
+        edge = await self.get_edge(channel_id)
+        # node1_policy contains the fee base and rate for payments from node1 to node2
+        if edge.node1_pub == await self.get_own_pubkey():
+            return edge.node1_policy
+        return edge.node2_policy
+
+    async def get_policy_from(self, channel_id):
+        edge = await self.get_edge(channel_id)
+        # node1_policy contains the fee base and rate for payments from node1 to node2
+        if edge.node1_pub == await self.get_own_pubkey():
+            return edge.node2_policy
+        return edge.node1_policy
+
+    async def get_ppm_to(self, channel_id):
+        policy = await self.get_policy_to(channel_id)
+        return policy.fee_rate_milli_msat
+
+    async def get_ppm_from(self, channel_id):
+        policy = await self.get_policy_from(channel_id)
+        return policy.fee_rate_milli_msat
+
+    async def send_payment(self, payment_request, route):
+        return await self.router_stub.SendToRouteV2(Lnd.get_send_to_route_request(payment_request, route))
+
+    async def is_zombie(self, channel_id):
+        try:
+            await self.get_edge(channel_id)
+        except Exception:
+            print(f"Unable to load channel {channel_id}!")
+            return True
+        return False
@@ -3,6 +3,7 @@ import math
 import output
 from output import Output, format_alias, format_fee_msat, format_ppm, format_amount, \
     format_warning, format_error, format_earning, format_fee_msat_red, format_fee_msat_white, format_channel_id
+from invoice_pool import InvoicePool
 from routes import Routes
 
 DEFAULT_BASE_FEE_SAT_MSAT = 1_000
@@ -25,7 +26,8 @@ class Logic:
             min_remote,
             output: Output,
             reckless,
-            ignore_missed_fee
+            ignore_missed_fee,
+            invoice_pool=None
     ):
         self.lnd = lnd
         self.first_hop_channel = first_hop_channel
@@ -40,10 +42,24 @@ class Logic:
         self.output = output
         self.reckless = reckless
         self.ignore_missed_fee = ignore_missed_fee
+        self.invoice_pool = invoice_pool
+        # a pool created by Logic itself is closed once the rebalance is done, so that no invoice is left open
+        self.owns_invoice_pool = invoice_pool is None
         if not self.fee_factor:
             self.fee_factor = 1.0
 
     def rebalance(self):
+        if not self.owns_invoice_pool:
+            return self.run_rebalance()
+        self.invoice_pool = InvoicePool(self.lnd)
+        try:
+            return self.run_rebalance()
+        finally:
+            self.invoice_pool.close()
+
+    def run_rebalance(self):
+        # the invoice is created while computing the fee limit
+        self.invoice_pool.prepare(self.get_invoice_memo(), self.amount)
         first_hop_alias_formatted = ""
         last_hop_alias_formatted = ""
         first_channel_id = 0
@@ -155,6 +171,7 @@ class Logic:
         response = self.lnd.send_payment(payment_request, route)
         is_successful = response.failure.code == 0
         if is_successful:
+            self.lnd.record_payment(route)
             self.print_success_statistics(route, route_ppm)
             return True
         else:
@@ -226,16 +243,25 @@ class Logic:
             routes.ignore_edge_on_route(failure_source_pubkey, route)
         elif code == 12:
             self.output.print_line(format_warning("Fee insufficient"))
+            self.invalidate_failing_channel(response, route)
         elif code == 14:
             self.output.print_line(format_warning("Channel disabled"))
             routes.ignore_edge_on_route(failure_source_pubkey, route)
+            self.invalidate_failing_channel(response, route)
         elif code == 13:
             self.output.print_line(format_warning("Incorrect CLTV expiry"))
             routes.ignore_edge_on_route(failure_source_pubkey, route)
+            self.invalidate_failing_channel(response, route)
         else:
             self.output.print_line(format_error(f"Unknown error code {repr(code)}:"))
             self.output.print_line(format_error(repr(response)))
 
+    def invalidate_failing_channel(self, response, route):
+        # the policy of the channel following the failure source is outdated
+        failure_source_index = response.failure.failure_source_index
+        if failure_source_index < len(route.hops):
+            self.lnd.invalidate_edge(route.hops[failure_source_index].chan_id)
+
     @staticmethod
     def get_failure_source_pubkey(response, route):
         if response.failure.failure_source_index == 0:
@@ -368,28 +394,27 @@ class Logic:
         return expected_fee
 
     def generate_invoice(self):
+        return self.invoice_pool.get(self.get_invoice_memo(), self.amount)
+
+    def get_invoice_memo(self):
         if self.last_hop_channel:
-            memo = f"Rebalance of channel with ID {self.last_hop_channel.chan_id}"
-        else:
-            memo = f"Rebalance of channel with ID {self.first_hop_channel.chan_id}"
-        return self.lnd.generate_invoice(memo, self.amount)
+            return f"Rebalance of channel with ID {self.last_hop_channel.chan_id}"
+        return f"Rebalance of channel with ID {self.first_hop_channel.chan_id}"
 
-    def get_channel_for_channel_id(self, channel_id, clear_cache_if_not_found=True):
-        for channel in self.lnd.get_channels():
-            if channel.chan_id == channel_id:
-                if not hasattr(channel, "local_balance"):
-                    channel.local_balance = 0
-                if not hasattr(channel, "remote_balance"):
-                    channel.remote_balance = 0
-                return channel
-        if clear_cache_if_not_found:
-            self.lnd.get_channels.cache_clear()
-            return self.get_channel_for_channel_id(channel_id, clear_cache_if_not_found=False)
-        raise Exception(f"Unable to find channel with id {channel_id}!")
+    def get_channel_for_channel_id(self, channel_id):
+        channel = self.lnd.get_channel(channel_id)
+        if channel is None:
+            raise Exception(f"Unable to find channel with id {channel_id}!")
+        if not hasattr(channel, "local_balance"):
+            channel.local_balance = 0
+        if not hasattr(channel, "remote_balance"):
+            channel.remote_balance = 0
+        return channel
 
     def initialize_ignored_channels(self, routes, fee_limit_msat, min_fee_last_hop):
         if self.reckless:
             self.output.print_line(format_error("Also considering economically unviable channels for routes."))
+        self.lnd.prefetch_edges(self.excluded)
         for chan_id in self.excluded:
             self.output.print_line(f"Channel {format_channel_id(chan_id)} is excluded:")
             routes.ignore_channel(chan_id)
@@ -0,0 +1,41 @@
+import grpc
+
+from grpc_generated import router_pb2 as lnrouter
+
+
+class MissionControl:
+    # pairs learned by lnd are stored in the cache file and imported again in the next run
+    def __init__(self, lnd, disk_cache):
+        self.lnd = lnd
+        self.disk_cache = disk_cache
+
+    def restore(self):
+        pairs = [
+            lnrouter.PairHistory(
+                node_from=bytes.fromhex(node_from),
+                node_to=bytes.fromhex(node_to),
+                history=lnrouter.PairData.FromString(history),
+            )
+            for (node_from, node_to), history in self.load_pairs().items()
+        ]
+        if not pairs:
+            return 0
+        try:
+            self.lnd.import_mission_control(pairs)
+        except grpc.RpcError as e:
+            print(f"Unable to import mission control: {e.details()}")
+            return 0
+        return len(pairs)
+
+    def store(self):
+        try:
+            pairs = self.lnd.query_mission_control()
+        except grpc.RpcError as e:
+            print(f"Unable to export mission control: {e.details()}")
+            return
+        self.disk_cache.put_many("pair", {
+            f"{pair.node_from.hex()}:{pair.node_to.hex()}": pair.history.SerializeToString() for pair in pairs
+        })
+
+    def load_pairs(self):
+        return {tuple(key.split(":")): value for key, value in self.disk_cache.get_all("pair").items()}
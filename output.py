@@ -16,6 +16,7 @@ class Output:
         sys.stdout.write(message)
 
     def print_route(self, route):
+        self.lnd.prefetch_node_aliases([h.pub_key for h in route.hops])
         route_str = "\n".join(
             self.get_channel_representation(h.chan_id, h.pub_key) + "\t" +
             self.get_fee_information(h, route)
@@ -32,6 +33,20 @@ class Output:
         alias_to_formatted = format_alias(f"{self.lnd.get_node_alias(pubkey_to):32}")
         return f"{channel_id_formatted} to {alias_to_formatted}"
 
+    def print_rpc_statistics(self, rpc_statistics):
+        self.print_line("")
+        self.print_line(
+            f"{'RPC':32} {'calls':>7} {'errors':>7} {'total ms':>10} {'avg ms':>8} {'p50 ms':>8} {'p90 ms':>8} "
+            f"{'max ms':>8} {'sent':>10} {'received':>12}"
+        )
+        for method, statistics in rpc_statistics.get_methods():
+            self.print_line(
+                f"{method:32} {statistics.calls:7,} {statistics.errors:7,} "
+                f"{statistics.total_latency_ms:10,.0f} {statistics.get_average_latency_ms():8,.1f} "
+                f"{statistics.get_latency_percentile_ms(50):8,.0f} {statistics.get_latency_percentile_ms(90):8,.0f} "
+                f"{statistics.max_latency_ms:8,.0f} {statistics.request_bytes:10,} {statistics.response_bytes:12,}"
+            )
+
     def get_fee_information(self, next_hop, route):
         hops = list(route.hops)
         if hops[0] == next_hop:
@@ -0,0 +1,34 @@
+import grpc
+
+from grpc_generated import lightning_pb2 as ln
+
+# the outcome of the HTLC is unknown if the connection was lost while waiting for it
+LOST_STATUS_CODES = {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.CANCELLED, grpc.StatusCode.DEADLINE_EXCEEDED}
+
+
+class PaymentAttempt:
+    # an HTLC that was sent using SendToRouteV2, the result is an ln.HTLCAttempt
+    def __init__(self, lnd, payment_hash, future):
+        self.lnd = lnd
+        self.payment_hash = payment_hash
+        self.future = future
+
+    def done(self):
+        return self.future.done()
+
+    def add_done_callback(self, callback):
+        self.future.add_done_callback(lambda _: callback(self))
+
+    def result(self):
+        try:
+            return self.future.result()
+        except grpc.RpcError as e:
+            if e.code() not in LOST_STATUS_CODES:
+                raise
+        return self.track()
+
+    def track(self):
+        for payment in self.lnd.track_payment(self.payment_hash):
+            if payment.htlcs and payment.htlcs[-1].status != ln.HTLCAttempt.IN_FLIGHT:
+                return payment.htlcs[-1]
+        raise Exception(f"Unable to track payment {self.payment_hash.hex()}")
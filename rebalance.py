@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import atexit
 import os
 import platform
 import random
@@ -8,15 +9,41 @@ import sys
 
 from yachalk import chalk
 
-from lnd import Lnd
-from logic import Logic
+from defaults import MAX_CONCURRENT_REQUESTS
+from disk_cache import DiskCache, DEFAULT_EDGE_TTL, DEFAULT_ALIAS_TTL
 from output import Output, format_alias, format_ppm, format_amount, format_amount_green, format_boring_string, \
     print_bar, format_channel_id, format_error
 
 class Rebalance:
     def __init__(self, arguments):
-        self.lnd = Lnd(arguments.lnddir, arguments.grpc, arguments.network)
+        # imported here, so that --help and invalid arguments are handled without loading gRPC and the generated code
+        from lnd import Lnd
+        from mission_control import MissionControl
+
+        disk_cache = None
+        self.mission_control = None
+        if arguments.cache_file:
+            disk_cache = DiskCache(arguments.cache_file, arguments.cache_edge_ttl, arguments.cache_alias_ttl)
+        self.lnd = Lnd(
+            arguments.lnddir,
+            arguments.grpc,
+            arguments.network,
+            arguments.graph_snapshot,
+            arguments.concurrency,
+            disk_cache,
+            record_file=arguments.record,
+            replay_file=arguments.replay,
+            hedge_reads=arguments.hedge_reads,
+            rpc_budget=arguments.rpc_budget,
+            local_routes=arguments.local_routes,
+            rate_limit=arguments.rpc_rate,
+        )
+        atexit.register(self.lnd.close_async)
+        if arguments.mission_control:
+            self.mission_control = MissionControl(self.lnd, disk_cache)
         self.output = Output(self.lnd)
+        if arguments.rpc_stats:
+            atexit.register(self.output.print_rpc_statistics, self.lnd.get_rpc_statistics())
         self.min_amount = arguments.min_amount
         self.arguments = arguments
         self.first_hop_channel_id = self.parse_channel_id(vars(arguments)["from"])
@@ -137,17 +164,19 @@ class Rebalance:
     def get_channel_for_channel_id(self, channel_id):
         if not channel_id:
             return None
-        for channel in self.lnd.get_channels():
-            if channel.chan_id == channel_id:
-                return channel
+        channel = self.lnd.get_channel(channel_id)
+        if channel is not None:
+            return channel
         raise Exception(f"Unable to find channel with ID {channel_id}")
 
     def get_private_channels(self):
-        return self.lnd.get_channels(active_only=True,private_only=True),
+        return self.lnd.get_channels(active_only=True, private_only=True)
 
     def list_channels(self, reverse=False):
+        channels = self.lnd.get_channels(active_only=True)
+        self.lnd.prefetch_node_aliases([c.remote_pubkey for c in channels])
         sorted_channels = sorted(
-            self.lnd.get_channels(active_only=True),
+            channels,
             key=lambda c: self.get_sort_key(c),
             reverse=reverse
         )
@@ -180,8 +209,10 @@ class Rebalance:
         print("")
 
     def list_channels_compact(self):
+        channels = self.lnd.get_channels(active_only=True)
+        self.lnd.prefetch_node_aliases([c.remote_pubkey for c in channels])
         candidates = sorted(
-            self.lnd.get_channels(active_only=True),
+            channels,
             key=lambda c: self.get_sort_key(c),
             reverse=False
             )
@@ -193,6 +224,9 @@ class Rebalance:
             print(f"{id_formatted} | {local_formatted} | {remote_formatted} | {alias_formatted}")
 
     def start(self):
+        from invoice_pool import InvoicePool
+        from logic import Logic
+
         if self.arguments.list_candidates and self.arguments.show_only:
             channel_id = self.parse_channel_id(self.arguments.show_only)
             channel = self.get_channel_for_channel_id(channel_id)
@@ -250,9 +284,13 @@ class Rebalance:
             for chan_id in self.arguments.exclude:
                 excluded.append(self.parse_channel_id(chan_id))
         if self.arguments.exclude_private:
-            private_channels = self.get_private_channels(self)
-            for channel in private_channels:
-                excluded.append(self.parse_channel_id(channel.chan_id))
+            for channel in self.get_private_channels():
+                excluded.append(channel.chan_id)
+        if self.mission_control:
+            self.mission_control.restore()
+            atexit.register(self.mission_control.store)
+        invoice_pool = InvoicePool(self.lnd)
+        atexit.register(invoice_pool.close)
         return Logic(
             self.lnd,
             self.first_hop_channel,
@@ -266,7 +304,8 @@ class Rebalance:
             self.min_remote,
             self.output,
             self.arguments.reckless,
-            self.arguments.ignore_missed_fee
+            self.arguments.ignore_missed_fee,
+            invoice_pool
         ).rebalance()
 
     def get_first_hop_candidates(self):
@@ -299,6 +338,11 @@ def main():
             argument_parser.print_help()
             sys.exit(1)
 
+    if arguments.mission_control and not arguments.cache_file:
+        print("You need to specify a cache file (--cache-file) for --mission-control")
+        argument_parser.print_help()
+        sys.exit(1)
+
     if arguments.reckless and not arguments.amount:
         print("You need to specify an amount for --reckless")
         argument_parser.print_help()
@@ -322,7 +366,13 @@ def main():
         argument_parser.print_help()
         sys.exit(1)
 
-    return Rebalance(arguments).start()
+    from limiter import BudgetExceededError
+
+    try:
+        return Rebalance(arguments).start()
+    except BudgetExceededError as e:
+        print(e)
+        return False
 
 
 def get_argument_parser():
@@ -345,6 +395,95 @@ def get_argument_parser():
         dest="grpc",
         help="(default localhost:10009) lnd gRPC endpoint",
     )
+    parser.add_argument(
+        "--graph-snapshot",
+        action="store_true",
+        default=False,
+        help="Load all channels of the network graph with a single request (DescribeGraph) instead of "
+             "requesting the information for each channel individually. This is faster for nodes with many channels.",
+    )
+    parser.add_argument(
+        "--local-routes",
+        action="store_true",
+        default=False,
+        help="Compute routes locally based on the network graph (see --graph-snapshot) instead of asking lnd. "
+             "This allows many more routes to be tried, but does not use the information lnd has about previous "
+             "payment attempts (mission control).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default=MAX_CONCURRENT_REQUESTS,
+        type=int,
+        help=f"(default {MAX_CONCURRENT_REQUESTS}) Maximum number of requests sent to lnd in parallel when loading "
+             f"information for many channels or nodes. Use 1 to send requests one after another.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        metavar="FILE",
+        help="If set, channel information (including fee rates) and node aliases are stored in the given file "
+             "and re-used in subsequent runs. See --cache-edge-ttl and --cache-alias-ttl.",
+    )
+    parser.add_argument(
+        "--cache-edge-ttl",
+        default=DEFAULT_EDGE_TTL,
+        type=int,
+        metavar="SECONDS",
+        help=f"(default {DEFAULT_EDGE_TTL:,}) Number of seconds channel information stored in --cache-file "
+             f"is considered valid.",
+    )
+    parser.add_argument(
+        "--cache-alias-ttl",
+        default=DEFAULT_ALIAS_TTL,
+        type=int,
+        metavar="SECONDS",
+        help=f"(default {DEFAULT_ALIAS_TTL:,}) Number of seconds node aliases stored in --cache-file "
+             f"are considered valid.",
+    )
+    parser.add_argument(
+        "--mission-control",
+        action="store_true",
+        default=False,
+        help="Store the payment successes and failures learned by lnd (mission control) in --cache-file when "
+             "the script exits, and import them into lnd before computing the first route of the next run.",
+    )
+    parser.add_argument(
+        "--rpc-stats",
+        action="store_true",
+        default=False,
+        help="Print statistics (number of calls, errors, latency, transferred bytes) "
+             "for each type of request sent to lnd when the script exits.",
+    )
+    parser.add_argument(
+        "--hedge-reads",
+        action="store_true",
+        default=False,
+        help="If a request for channel or node information takes longer than usual, "
+             "send a second identical request and use the first response.",
+    )
+    parser.add_argument(
+        "--rpc-budget",
+        type=int,
+        metavar="REQUESTS",
+        help="Stop once this number of requests has been sent to lnd.",
+    )
+    parser.add_argument(
+        "--rpc-rate",
+        action="store_true",
+        default=False,
+        help="Limit the rate of requests sent to lnd, for example to at most 10 route computations per second.",
+    )
+    recording_group = parser.add_mutually_exclusive_group()
+    recording_group.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Write all requests sent to lnd and the corresponding responses (including timing information) "
+             "to the given file. See --replay.",
+    )
+    recording_group.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Do not connect to lnd. Instead, answer all requests using the responses recorded with --record.",
+    )
     list_group = parser.add_argument_group(
         "list candidates", "Show the unbalanced channels."
     )
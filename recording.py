@@ -0,0 +1,319 @@
+import base64
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+import grpc
+
+
+class Recorder:
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+
+    def record(self, method, request_bytes, responses_bytes, error, duration_ms, stream=False):
+        entry = {
+            "method": as_string(method),
+            "request": encode(request_bytes),
+            "responses": [encode(response_bytes) for response_bytes in responses_bytes],
+            "stream": stream,
+            "error": error,
+            "duration_ms": round(duration_ms, 3),
+        }
+        with self.lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class RecordingInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        start = time.perf_counter()
+        outcome = continuation(client_call_details, request)
+
+        def record(future):
+            duration_ms = (time.perf_counter() - start) * 1_000
+            if future.exception() is None:
+                responses = [future.result().SerializeToString()]
+                error = None
+            else:
+                responses = []
+                error = get_error(future.exception())
+            self.recorder.record(
+                client_call_details.method, request.SerializeToString(), responses, error, duration_ms
+            )
+        outcome.add_done_callback(record)
+        return outcome
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return RecordingStream(
+            continuation(client_call_details, request),
+            lambda responses, error, duration_ms: self.recorder.record(
+                client_call_details.method, request.SerializeToString(), responses, error, duration_ms, stream=True
+            )
+        )
+
+
+class RecordingStream:
+    def __init__(self, call, record):
+        self.call = call
+        self.record = record
+        self.start = time.perf_counter()
+        self.responses = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            response = next(self.call)
+        except StopIteration:
+            self.record(self.responses, None, (time.perf_counter() - self.start) * 1_000)
+            raise
+        except grpc.RpcError as e:
+            self.record(self.responses, get_error(e), (time.perf_counter() - self.start) * 1_000)
+            raise
+        self.responses.append(response.SerializeToString())
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.call, name)
+
+
+class AsyncRecordingInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        start = time.perf_counter()
+        call = await continuation(client_call_details, request)
+        try:
+            response = await call
+        except grpc.RpcError as e:
+            duration_ms = (time.perf_counter() - start) * 1_000
+            self.recorder.record(client_call_details.method, request.SerializeToString(), [], get_error(e), duration_ms)
+            raise
+        duration_ms = (time.perf_counter() - start) * 1_000
+        self.recorder.record(
+            client_call_details.method, request.SerializeToString(), [response.SerializeToString()], None, duration_ms
+        )
+        return response
+
+
+class ReplayChannel(grpc.Channel):
+    # serves recorded responses instead of sending requests to lnd
+    def __init__(self, path, simulate_latency=False):
+        self.simulate_latency = simulate_latency
+        self.entries_by_request = defaultdict(deque)
+        self.entries_by_method = defaultdict(deque)
+        self.lock = threading.Lock()
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry["used"] = False
+                method = as_string(entry["method"])
+                self.entries_by_request[(method, entry["request"])].append(entry)
+                self.entries_by_method[method].append(entry)
+
+    def get_entry(self, method, request_bytes):
+        method = as_string(method)
+        with self.lock:
+            # prefer a response recorded for the same request, fall back to the next response for the method
+            entries = self.entries_by_request.get((method, encode(request_bytes)))
+            if not entries:
+                entries = deque(e for e in self.entries_by_method.get(method, ()) if not e["used"])
+                self.entries_by_method[method] = entries
+            if not entries:
+                raise ReplayError(grpc.StatusCode.UNAVAILABLE, f"No recorded response for {method}")
+            entry = entries[0]
+            if len(entries) > 1:
+                entries.popleft()
+            entry["used"] = True
+        if self.simulate_latency:
+            time.sleep(entry["duration_ms"] / 1_000)
+        return entry
+
+    def unary_unary(self, method, request_serializer=None, response_deserializer=None, _registered_method=False):
+        return ReplayUnaryUnary(self, method, request_serializer, response_deserializer)
+
+    def unary_stream(self, method, request_serializer=None, response_deserializer=None, _registered_method=False):
+        return ReplayUnaryStream(self, method, request_serializer, response_deserializer)
+
+    def stream_unary(self, method, request_serializer=None, response_deserializer=None, _registered_method=False):
+        return ReplayUnsupported(method)
+
+    def stream_stream(self, method, request_serializer=None, response_deserializer=None, _registered_method=False):
+        return ReplayUnsupported(method)
+
+    def subscribe(self, callback, try_to_connect=False):
+        pass
+
+    def unsubscribe(self, callback):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class ReplayUnaryUnary:
+    def __init__(self, channel, method, request_serializer, response_deserializer):
+        self.channel = channel
+        self.method = method
+        self.request_serializer = request_serializer
+        self.response_deserializer = response_deserializer
+
+    def __call__(self, request, *args, **kwargs):
+        return self.with_call(request)[0]
+
+    def with_call(self, request, *args, **kwargs):
+        entry = self.channel.get_entry(self.method, self.request_serializer(request))
+        if entry["error"]:
+            raise ReplayError.from_entry(entry)
+        response = self.response_deserializer(decode(entry["responses"][0]))
+        return response, ReplayOutcome(response)
+
+    def future(self, request, *args, **kwargs):
+        try:
+            return self.with_call(request)[1]
+        except ReplayError as e:
+            return e
+
+
+class ReplayUnaryStream:
+    def __init__(self, channel, method, request_serializer, response_deserializer):
+        self.channel = channel
+        self.method = method
+        self.request_serializer = request_serializer
+        self.response_deserializer = response_deserializer
+
+    def __call__(self, request, *args, **kwargs):
+        entry = self.channel.get_entry(self.method, self.request_serializer(request))
+        return ReplayStream(
+            [self.response_deserializer(decode(response)) for response in entry["responses"]],
+            ReplayError.from_entry(entry) if entry["error"] else None,
+        )
+
+
+class ReplayUnsupported:
+    def __init__(self, method):
+        self.method = method
+
+    def __call__(self, *args, **kwargs):
+        raise ReplayError(grpc.StatusCode.UNIMPLEMENTED, f"Replaying {as_string(self.method)} is not supported")
+
+
+class ReplayStream:
+    def __init__(self, responses, error):
+        self.responses = deque(responses)
+        self.error = error
+        self.cancelled = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.cancelled:
+            raise ReplayError(grpc.StatusCode.CANCELLED, "Cancelled")
+        if self.responses:
+            return self.responses.popleft()
+        if self.error is not None:
+            raise self.error
+        raise StopIteration
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+
+class ReplayOutcome:
+    # mimics the future returned by grpc for completed calls
+    def __init__(self, response):
+        self.response = response
+
+    def result(self, timeout=None):
+        return self.response
+
+    def exception(self, timeout=None):
+        return None
+
+    def done(self):
+        return True
+
+    def cancelled(self):
+        return False
+
+    def add_done_callback(self, callback):
+        callback(self)
+
+    def code(self):
+        return grpc.StatusCode.OK
+
+    def details(self):
+        return ""
+
+
+class ReplayError(grpc.RpcError):
+    def __init__(self, status_code, error_details):
+        super().__init__(error_details)
+        self.status_code = status_code
+        self.error_details = error_details
+
+    @staticmethod
+    def from_entry(entry):
+        return ReplayError(grpc.StatusCode[entry["error"]["code"]], entry["error"]["details"])
+
+    def code(self):
+        return self.status_code
+
+    def details(self):
+        return self.error_details
+
+    def result(self, timeout=None):
+        raise self
+
+    def exception(self, timeout=None):
+        return self
+
+    def done(self):
+        return True
+
+    def cancelled(self):
+        return False
+
+    def add_done_callback(self, callback):
+        callback(self)
+
+
+def get_error(exception):
+    if isinstance(exception, grpc.RpcError) and hasattr(exception, "code"):
+        return {"code": exception.code().name, "details": exception.details()}
+    return {"code": grpc.StatusCode.UNKNOWN.name, "details": str(exception)}
+
+
+def encode(data):
+    return base64.b64encode(data).decode()
+
+
+def decode(data):
+    return base64.b64decode(data)
+
+
+def as_string(method):
+    if isinstance(method, bytes):
+        return method.decode()
+    return method
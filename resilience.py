@@ -0,0 +1,147 @@
+import asyncio
+import random
+import time
+from concurrent import futures
+
+import grpc
+
+from rpc_stats import get_method_name
+
+# deadlines in seconds, None means no deadline (for example, payments may take a while to settle or fail)
+DEFAULT_DEADLINE = 30
+DEADLINES = {
+    "Lightning/DescribeGraph": 120,
+    "Lightning/QueryRoutes": 60,
+    "Lightning/GetChanInfo": 10,
+    "Lightning/GetNodeInfo": 10,
+    "Lightning/GetInfo": 10,
+    "Router/SendToRoute": None,
+    "Router/SendToRouteV2": None,
+}
+# requests that do not change anything in lnd, so that they can be sent more than once
+IDEMPOTENT_METHODS = {
+    "Lightning/GetInfo",
+    "Lightning/ListChannels",
+    "Lightning/GetChanInfo",
+    "Lightning/GetNodeInfo",
+    "Lightning/DescribeGraph",
+    "Lightning/FeeReport",
+    "Lightning/QueryRoutes",
+    "Lightning/DecodePayReq",
+}
+HEDGED_METHODS = {
+    "Lightning/GetChanInfo",
+    "Lightning/GetNodeInfo",
+}
+TRANSIENT_STATUS_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+}
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2
+# the second request is sent once the first one takes longer than most requests of the same kind
+HEDGE_PERCENTILE = 90
+HEDGE_MIN_CALLS = 20
+DEFAULT_HEDGE_DELAY = 0.5
+
+
+class ResilienceInterceptor(grpc.UnaryUnaryClientInterceptor):
+    def __init__(self, rpc_statistics=None, hedge_reads=False):
+        self.rpc_statistics = rpc_statistics
+        self.hedge_reads = hedge_reads
+        self.executor = futures.ThreadPoolExecutor(thread_name_prefix="hedged-request") if hedge_reads else None
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        client_call_details = with_deadline(client_call_details, method)
+        attempts = MAX_ATTEMPTS if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            if self.hedge_reads and method in HEDGED_METHODS:
+                outcome = self.send_hedged(continuation, client_call_details, request, method)
+            else:
+                outcome = continuation(client_call_details, request)
+            if attempt == attempts - 1 or not is_transient(outcome.exception()):
+                return outcome
+            time.sleep(get_backoff(attempt))
+
+    def send_hedged(self, continuation, client_call_details, request, method):
+        first = self.executor.submit(continuation, client_call_details, request)
+        done, _ = futures.wait([first], timeout=get_hedge_delay(self.rpc_statistics, method))
+        if done:
+            return first.result()
+        second = self.executor.submit(continuation, client_call_details, request)
+        pending = {first, second}
+        outcome = None
+        # use the first successful response, the slower request is left to finish (or time out) on its own
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                outcome = future.result()
+                if outcome.exception() is None:
+                    return outcome
+        return outcome
+
+
+class AsyncResilienceInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    def __init__(self, rpc_statistics=None, hedge_reads=False):
+        self.rpc_statistics = rpc_statistics
+        self.hedge_reads = hedge_reads
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        client_call_details = with_deadline(client_call_details, method)
+        attempts = MAX_ATTEMPTS if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            try:
+                if self.hedge_reads and method in HEDGED_METHODS:
+                    return await self.send_hedged(continuation, client_call_details, request, method)
+                return await (await continuation(client_call_details, request))
+            except grpc.RpcError as e:
+                if attempt == attempts - 1 or not is_transient(e):
+                    raise
+            await asyncio.sleep(get_backoff(attempt))
+
+    async def send_hedged(self, continuation, client_call_details, request, method):
+        async def send():
+            return await (await continuation(client_call_details, request))
+
+        first = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait([first], timeout=get_hedge_delay(self.rpc_statistics, method))
+        if done:
+            return first.result()
+        pending = {first, asyncio.ensure_future(send())}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+
+def with_deadline(client_call_details, method):
+    if client_call_details.timeout is not None:
+        return client_call_details
+    return client_call_details._replace(timeout=DEADLINES.get(method, DEFAULT_DEADLINE))
+
+
+def is_transient(exception):
+    return isinstance(exception, grpc.RpcError) and hasattr(exception, "code") \
+        and exception.code() in TRANSIENT_STATUS_CODES
+
+
+def get_backoff(attempt):
+    # "full jitter", so that parallel requests do not retry at the same time
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def get_hedge_delay(rpc_statistics, method):
+    statistics = rpc_statistics.get(method) if rpc_statistics is not None else None
+    if statistics is None or statistics.calls < HEDGE_MIN_CALLS:
+        return DEFAULT_HEDGE_DELAY
+    return statistics.get_latency_percentile_ms(HEDGE_PERCENTILE) / 1_000
@@ -0,0 +1,315 @@
+import heapq
+
+from grpc_generated import lightning_pb2 as ln
+
+# lnd rejects routes with a larger total time lock delta (see --max-cltv-expiry)
+MAX_CLTV_DELTA = 2016
+# like lnd, added to the final CLTV delta, so that the payment does not fail if a block is found in the meantime
+BLOCK_PADDING = 3
+# our own node is the source of each route, payments arriving at our own node reach this node instead
+TARGET = "target"
+
+
+class RouteEngine:
+    # computes routes using the channel graph loaded from lnd (see --graph-snapshot) instead of QueryRoutes
+    def __init__(self, graph, own_pubkey):
+        self.graph = graph
+        self.own_pubkey = own_pubkey
+
+    def get_routes(
+        self,
+        amount_msat,
+        block_height,
+        final_cltv_delta,
+        own_channels,
+        first_hop_channel_id,
+        last_hop_pubkey,
+        fee_limit_msat,
+        ignored_pairs,
+        ignored_nodes,
+        max_paths,
+    ):
+        search = RouteSearch(
+            self,
+            amount_msat,
+            block_height,
+            final_cltv_delta,
+            own_channels,
+            first_hop_channel_id,
+            last_hop_pubkey,
+            fee_limit_msat,
+            ignored_pairs,
+            ignored_nodes,
+        )
+        return search.get_routes(max_paths)
+
+
+class RouteSearch:
+    # Yen's k shortest loopless paths, where the cost of each channel is its fee for the rebalance amount.
+    # The ignored pairs and nodes are shared with Routes, so that pairs ignored after a failed attempt are respected.
+    def __init__(
+        self,
+        engine,
+        amount_msat,
+        block_height,
+        final_cltv_delta,
+        own_channels,
+        first_hop_channel_id,
+        last_hop_pubkey,
+        fee_limit_msat,
+        ignored_pairs,
+        ignored_nodes,
+    ):
+        self.graph = engine.graph
+        self.own_pubkey = engine.own_pubkey
+        self.amount_msat = amount_msat
+        self.block_height = block_height
+        self.final_cltv_delta = final_cltv_delta
+        self.own_channels = {channel.chan_id: channel for channel in own_channels}
+        self.first_hop_channel_id = first_hop_channel_id
+        self.last_hop_pubkey = last_hop_pubkey
+        self.fee_limit_msat = fee_limit_msat
+        self.ignored_pairs = ignored_pairs
+        self.ignored_nodes = ignored_nodes
+        self.node_keys = {}
+        self.channels = {}
+        self.distances = None
+
+    def get_routes(self, max_paths):
+        # a generator, so that the next route is only computed once it is needed
+        self.distances = self.get_distances_to_target()
+        path = self.find_path(self.own_pubkey, set(), set())
+        if path is None:
+            return
+        paths = [path]
+        candidates = []
+        seen = {get_channel_ids(path)}
+        counter = 0
+        # spur paths starting before the node where a path deviates from its predecessor were computed already
+        deviation = 0
+        while True:
+            route = self.build_route(path)
+            if route is not None and not self.is_ignored(path):
+                yield route
+            if len(paths) >= max_paths:
+                return
+            nodes = [self.own_pubkey] + [next_node for _, next_node, _, _ in path]
+            for i in range(deviation, len(path)):
+                root = path[:i]
+                excluded_channels = {other[i][2] for other in paths if len(other) > i and other[:i] == root}
+                spur = self.find_path(nodes[i], set(nodes[:i]), excluded_channels, get_cost(root))
+                if spur is None:
+                    continue
+                candidate = root + spur
+                channel_ids = get_channel_ids(candidate)
+                if channel_ids in seen:
+                    continue
+                seen.add(channel_ids)
+                counter += 1
+                heapq.heappush(candidates, (get_cost(candidate), counter, i, candidate))
+            if not candidates:
+                return
+            _, _, deviation, path = heapq.heappop(candidates)
+            paths.append(path)
+
+    def find_path(self, start, excluded_nodes, excluded_channels, root_cost=0):
+        # A*, the distances to the target computed without any exclusions are a lower bound of the remaining cost
+        if start not in self.distances:
+            return None
+        best = {start: 0}
+        previous = {}
+        queue = [(self.distances[start], 0, start)]
+        while queue:
+            _, cost, node = heapq.heappop(queue)
+            if node == TARGET:
+                return self.get_path(previous, start)
+            if cost > best[node]:
+                continue
+            node_key = self.get_node_key(node)
+            if node_key in self.ignored_nodes:
+                continue
+            for chan_id, next_node, fee_msat, next_node_key in self.get_channels(node):
+                if chan_id in excluded_channels or next_node in excluded_nodes or next_node not in self.distances:
+                    continue
+                if next_node_key in self.ignored_nodes or (node_key, next_node_key) in self.ignored_pairs:
+                    continue
+                next_cost = cost + fee_msat
+                estimate = next_cost + self.distances[next_node]
+                if self.fee_limit_msat and root_cost + estimate > self.fee_limit_msat:
+                    continue
+                if next_cost >= best.get(next_node, next_cost + 1):
+                    continue
+                best[next_node] = next_cost
+                previous[next_node] = (node, next_node, chan_id, fee_msat)
+                heapq.heappush(queue, (estimate, next_cost, next_node))
+        return None
+
+    @staticmethod
+    def get_path(previous, start):
+        path = []
+        node = TARGET
+        while node != start:
+            path.insert(0, previous[node])
+            node = previous[node][0]
+        return path
+
+    def get_distances_to_target(self):
+        # Dijkstra from the target back to all nodes, following the channels in the opposite direction
+        distances = {TARGET: 0}
+        queue = [(0, TARGET)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node] or node == self.own_pubkey:
+                continue
+            current = self.own_pubkey if node == TARGET else node
+            for chan_id in self.get_channel_ids(current):
+                edge = self.graph.get_edge(chan_id)
+                if edge is None:
+                    continue
+                previous_node = edge.node2_pub if edge.node1_pub == current else edge.node1_pub
+                result = self.get_channel(previous_node, chan_id)
+                if result is None or result[0] != node:
+                    continue
+                next_distance = distance + result[1]
+                if next_distance < distances.get(previous_node, next_distance + 1):
+                    distances[previous_node] = next_distance
+                    heapq.heappush(queue, (next_distance, previous_node))
+        return distances
+
+    def get_channel_ids(self, node):
+        # copied, as updates are applied in another thread
+        return tuple(self.graph.channels_by_node.get(node, ()))
+
+    def get_channels(self, node):
+        # the usable channels leaving the node, ignored pairs and nodes change during the search and are not included
+        channels = self.channels.get(node)
+        if channels is None:
+            channels = []
+            for chan_id in self.get_channel_ids(node):
+                result = self.get_channel(node, chan_id, False)
+                if result is not None:
+                    next_node, fee_msat = result
+                    next_pubkey = self.own_pubkey if next_node == TARGET else next_node
+                    channels.append((chan_id, next_node, fee_msat, self.get_node_key(next_pubkey)))
+            self.channels[node] = channels
+        return channels
+
+    def get_channel(self, node, chan_id, check_ignored=True):
+        # returns the node reached by sending the rebalance amount from node through the channel, and the fee
+        edge = self.graph.get_edge(chan_id)
+        if edge is None:
+            return None
+        if node == edge.node1_pub:
+            next_node, policy = edge.node2_pub, edge.node1_policy
+        else:
+            next_node, policy = edge.node1_pub, edge.node2_policy
+        if check_ignored and self.is_ignored_pair(node, next_node):
+            return None
+        if node == self.own_pubkey:
+            own_channel = self.own_channels.get(chan_id)
+            if own_channel is None or own_channel.local_balance * 1_000 < self.amount_msat:
+                return None
+            if self.first_hop_channel_id and chan_id != self.first_hop_channel_id:
+                return None
+            return next_node, 0
+        if not self.can_forward(edge, policy, self.amount_msat):
+            return None
+        if next_node == self.own_pubkey:
+            own_channel = self.own_channels.get(chan_id)
+            if own_channel is None or own_channel.remote_balance * 1_000 < self.amount_msat:
+                return None
+            if self.last_hop_pubkey and node != self.last_hop_pubkey:
+                return None
+            next_node = TARGET
+        return next_node, get_fee_msat(policy, self.amount_msat)
+
+    @staticmethod
+    def can_forward(edge, policy, amount_msat):
+        if policy.disabled or policy.last_update == 0 or amount_msat < policy.min_htlc:
+            return False
+        if policy.max_htlc_msat and amount_msat > policy.max_htlc_msat:
+            return False
+        return amount_msat <= edge.capacity * 1_000
+
+    def is_ignored_pair(self, node, next_node):
+        node_key = self.get_node_key(node)
+        next_node_key = self.get_node_key(next_node)
+        if node_key in self.ignored_nodes or next_node_key in self.ignored_nodes:
+            return True
+        return (node_key, next_node_key) in self.ignored_pairs
+
+    def is_ignored(self, path):
+        for node, next_node, _, _ in path:
+            if self.is_ignored_pair(node, self.own_pubkey if next_node == TARGET else next_node):
+                return True
+        return False
+
+    def get_node_key(self, pubkey):
+        node_key = self.node_keys.get(pubkey)
+        if node_key is None:
+            node_key = bytes.fromhex(pubkey)
+            self.node_keys[pubkey] = node_key
+        return node_key
+
+    def build_route(self, path):
+        # the fees and time locks are computed backwards, starting with the amount received by our own node
+        hops = []
+        amount_to_forward_msat = self.amount_msat
+        expiry = self.block_height + self.final_cltv_delta + BLOCK_PADDING
+        for i in reversed(range(len(path))):
+            node, next_node, chan_id, _ = path[i]
+            edge = self.graph.get_edge(chan_id)
+            if edge is None:
+                return None
+            pub_key = self.own_pubkey if next_node == TARGET else next_node
+            fee_msat = 0
+            time_lock_delta = 0
+            if i < len(path) - 1:
+                next_edge = self.graph.get_edge(path[i + 1][2])
+                if next_edge is None:
+                    return None
+                policy = next_edge.node1_policy if next_edge.node1_pub == pub_key else next_edge.node2_policy
+                fee_msat = get_fee_msat(policy, amount_to_forward_msat)
+                time_lock_delta = policy.time_lock_delta
+                if not self.can_forward(next_edge, policy, amount_to_forward_msat):
+                    return None
+            hops.insert(0, ln.Hop(
+                chan_id=chan_id,
+                chan_capacity=edge.capacity,
+                amt_to_forward=amount_to_forward_msat // 1_000,
+                amt_to_forward_msat=amount_to_forward_msat,
+                fee=fee_msat // 1_000,
+                fee_msat=fee_msat,
+                expiry=expiry,
+                pub_key=pub_key,
+                tlv_payload=True,
+            ))
+            amount_to_forward_msat += fee_msat
+            expiry += time_lock_delta
+        total_fees_msat = amount_to_forward_msat - self.amount_msat
+        if self.fee_limit_msat and total_fees_msat > self.fee_limit_msat:
+            return None
+        if expiry - self.block_height > MAX_CLTV_DELTA:
+            return None
+        if self.own_channels[path[0][2]].local_balance * 1_000 < amount_to_forward_msat:
+            return None
+        return ln.Route(
+            total_time_lock=expiry,
+            total_fees=total_fees_msat // 1_000,
+            total_fees_msat=total_fees_msat,
+            total_amt=amount_to_forward_msat // 1_000,
+            total_amt_msat=amount_to_forward_msat,
+            hops=hops,
+        )
+
+
+def get_fee_msat(policy, amount_msat):
+    return policy.fee_base_msat + amount_msat * policy.fee_rate_milli_msat // 1_000_000
+
+
+def get_channel_ids(path):
+    return tuple(chan_id for _, _, chan_id, _ in path)
+
+
+def get_cost(path):
+    return sum(fee_msat for _, _, _, fee_msat in path)
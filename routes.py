@@ -1,15 +1,16 @@
 import base64
+from collections import defaultdict, deque
+
+from output import format_alias
 
 MAX_ROUTES_TO_REQUEST = 100
+# routes computed by the local route engine are cheap, so that many more can be tried
+MAX_LOCAL_ROUTES = 1_000
+# once a node failed to forward this number of payments, the whole node is ignored
+MAX_FAILURES_PER_NODE = 3
 
 
 class Routes:
-    num_requested_routes = 0
-    all_routes = []
-    returned_routes = []
-    ignored_pairs = []
-    ignored_nodes = []
-
     def __init__(
         self,
         lnd,
@@ -25,29 +26,82 @@ class Routes:
         self.last_hop_channel = last_hop_channel
         self.fee_limit_msat = fee_limit_msat
         self.output = output
+        self.num_requested_routes = 0
+        self.route_fingerprints = set()
+        self.pending_routes = deque()
+        # (from, to) => pair as sent to lnd, in the order the pairs were ignored
+        self.ignored_pairs = {}
+        self.ignored_pairs_per_node = defaultdict(int)
+        self.failures_per_node = defaultdict(int)
+        self.ignored_nodes = {}
+        self.protected_nodes = None
+        self.route_request = None
+        self.local_routes = None
 
     def has_next(self):
         self.update_routes()
-        return self.returned_routes < self.all_routes
+        return len(self.pending_routes) > 0
 
     def get_next(self):
         self.update_routes()
-        for route in self.all_routes:
-            if route not in self.returned_routes:
-                self.returned_routes.append(route)
-                return route
+        if self.pending_routes:
+            return self.pending_routes.popleft()
         return None
 
     def update_routes(self):
         while True:
-            if self.returned_routes < self.all_routes:
+            if self.pending_routes:
                 return
             if self.num_requested_routes >= MAX_ROUTES_TO_REQUEST:
                 return
             self.request_route()
 
     def request_route(self):
-        amount = self.get_amount()
+        route_engine = self.lnd.get_route_engine()
+        if route_engine is not None:
+            self.request_local_route(route_engine)
+            return
+        routes = self.lnd.query_routes(self.get_route_request())
+        if routes is None:
+            self.num_requested_routes = MAX_ROUTES_TO_REQUEST
+        else:
+            self.num_requested_routes += 1
+            for route in routes:
+                self.add_route(route)
+
+    def request_local_route(self, route_engine):
+        if self.local_routes is None:
+            if self.last_hop_channel:
+                last_hop_pubkey = self.last_hop_channel.remote_pubkey
+            else:
+                last_hop_pubkey = None
+            if self.first_hop_channel:
+                first_hop_channel_id = self.first_hop_channel.chan_id
+            else:
+                first_hop_channel_id = None
+            self.local_routes = route_engine.get_routes(
+                self.get_amount() * 1_000,
+                self.lnd.get_block_height(),
+                self.payment_request.cltv_expiry,
+                self.lnd.get_channels(active_only=True),
+                first_hop_channel_id,
+                last_hop_pubkey,
+                self.fee_limit_msat,
+                self.ignored_pairs,
+                self.ignored_nodes,
+                MAX_LOCAL_ROUTES,
+            )
+        # each route is computed once the previous one was tried, the search ends after MAX_LOCAL_ROUTES
+        route = next(self.local_routes, None)
+        if route is None:
+            self.num_requested_routes = MAX_ROUTES_TO_REQUEST
+        else:
+            self.add_route(route)
+
+    def get_route_request(self):
+        # the request is re-used for all queries, ignored pairs are added to it once they are ignored
+        if self.route_request is not None:
+            return self.route_request
         if self.last_hop_channel:
             last_hop_pubkey = self.last_hop_channel.remote_pubkey
         else:
@@ -56,26 +110,30 @@ class Routes:
             first_hop_channel_id = self.first_hop_channel.chan_id
         else:
             first_hop_channel_id = None
-        routes = self.lnd.get_route(
+        self.route_request = self.lnd.get_route_request(
+            self.lnd.get_own_pubkey(),
             last_hop_pubkey,
-            amount,
-            self.ignored_pairs,
-            self.ignored_nodes,
+            self.get_amount(),
+            list(self.ignored_pairs.values()),
+            list(self.ignored_nodes),
             first_hop_channel_id,
             self.fee_limit_msat,
+            self.payment_request.cltv_expiry,
         )
-        if routes is None:
-            self.num_requested_routes = MAX_ROUTES_TO_REQUEST
-        else:
-            self.num_requested_routes += 1
-            for route in routes:
-                self.add_route(route)
+        return self.route_request
 
     def add_route(self, route):
         if route is None:
             return
-        if route not in self.all_routes:
-            self.all_routes.append(route)
+        fingerprint = Routes.get_fingerprint(route)
+        if fingerprint not in self.route_fingerprints:
+            self.route_fingerprints.add(fingerprint)
+            self.pending_routes.append(route)
+
+    @staticmethod
+    def get_fingerprint(route):
+        # the total amount changes with the fees, so that a route is tried again once a fee rate was updated
+        return route.total_amt_msat, tuple(hop.chan_id for hop in route.hops)
 
     def get_amount(self):
         return self.payment_request.num_satoshis
@@ -92,6 +150,7 @@ class Routes:
                 self.ignore_edge_from_to(
                     hop.chan_id, failure_source_pubkey, hop.pub_key
                 )
+                self.record_failure(failure_source_pubkey)
                 return
             if hop.pub_key == failure_source_pubkey:
                 ignore_next = True
@@ -137,13 +196,52 @@ class Routes:
         self.ignore_edge_from_to(chan_id, edge.node2_pub, edge.node1_pub)
 
     def ignore_edge_from_to(self, chan_id, from_pubkey, to_pubkey, show_message=True):
-        pair = {
-            "from": base64.b16decode(from_pubkey, True),
-            "to": base64.b16decode(to_pubkey, True),
-        }
-        if pair in self.ignored_pairs:
+        key = (base64.b16decode(from_pubkey, True), base64.b16decode(to_pubkey, True))
+        if key in self.ignored_pairs or key[0] in self.ignored_nodes or key[1] in self.ignored_nodes:
             return
         if show_message:
             self.output.print_line(
                 f"Ignoring {self.output.get_channel_representation(chan_id, to_pubkey, from_pubkey)}")
-        self.ignored_pairs.append(pair)
+        self.ignored_pairs[key] = {"from": key[0], "to": key[1]}
+        if self.route_request is not None:
+            self.route_request.ignored_pairs.add(**self.ignored_pairs[key])
+        self.ignored_pairs_per_node[key[0]] += 1
+        if self.are_all_peers_ignored(key[0]):
+            self.ignore_node(from_pubkey, show_message)
+
+    def record_failure(self, pubkey):
+        node = base64.b16decode(pubkey, True)
+        self.failures_per_node[node] += 1
+        if self.failures_per_node[node] >= MAX_FAILURES_PER_NODE:
+            self.ignore_node(pubkey)
+
+    def are_all_peers_ignored(self, node):
+        # the peers are only known with a graph snapshot, ignoring the node then does not exclude any other channel
+        graph = self.lnd.get_graph()
+        if graph is None:
+            return False
+        peers = graph.get_peers(node.hex())
+        return len(peers) > 0 and self.ignored_pairs_per_node[node] >= len(peers)
+
+    def ignore_node(self, pubkey, show_message=True):
+        node = base64.b16decode(pubkey, True)
+        if node in self.ignored_nodes or pubkey.lower() in self.get_protected_nodes():
+            return
+        if show_message:
+            self.output.print_line(f"Ignoring node {format_alias(self.lnd.get_node_alias(pubkey))}")
+        self.ignored_nodes[node] = None
+        # pairs including the node are no longer needed
+        for key in [key for key in self.ignored_pairs if node in key]:
+            del self.ignored_pairs[key]
+        if self.route_request is not None:
+            self.route_request.ignored_nodes.append(node)
+            del self.route_request.ignored_pairs[:]
+            for pair in self.ignored_pairs.values():
+                self.route_request.ignored_pairs.add(**pair)
+
+    def get_protected_nodes(self):
+        # ignoring our own node or one of our peers might exclude all first or last hops
+        if self.protected_nodes is None:
+            self.protected_nodes = {channel.remote_pubkey for channel in self.lnd.get_channels()}
+            self.protected_nodes.add(self.lnd.get_own_pubkey())
+        return self.protected_nodes
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import grpc
+
+# upper bounds (in milliseconds) of the latency histogram buckets, the last bucket has no upper bound
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000, 2_000, 5_000, 10_000, 30_000]
+
+
+class MethodStatistics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def record(self, latency_ms, error, request_bytes, response_bytes):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.total_latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        self.latency_histogram[get_bucket(latency_ms)] += 1
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+    def get_average_latency_ms(self):
+        if self.calls == 0:
+            return 0.0
+        return self.total_latency_ms / self.calls
+
+    def get_latency_percentile_ms(self, percentile):
+        # returns the upper bound of the bucket containing the percentile, but never more than the largest latency
+        threshold = self.calls * percentile / 100
+        count = 0
+        for bucket, bucket_count in enumerate(self.latency_histogram):
+            count += bucket_count
+            if count >= threshold and bucket_count > 0:
+                if bucket < len(LATENCY_BUCKETS_MS):
+                    return min(LATENCY_BUCKETS_MS[bucket], self.max_latency_ms)
+                return self.max_latency_ms
+        return 0.0
+
+
+class RpcStatistics:
+    def __init__(self):
+        self.methods = {}
+        self.lock = threading.Lock()
+
+    def record(self, method, latency_ms, error, request_bytes, response_bytes):
+        with self.lock:
+            statistics = self.methods.get(method)
+            if statistics is None:
+                statistics = MethodStatistics()
+                self.methods[method] = statistics
+            statistics.record(latency_ms, error, request_bytes, response_bytes)
+
+    def get(self, method):
+        return self.methods.get(method)
+
+    def get_methods(self):
+        with self.lock:
+            return sorted(self.methods.items(), key=lambda item: -item[1].total_latency_ms)
+
+
+class RpcStatisticsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    def __init__(self, statistics):
+        self.statistics = statistics
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        start = time.perf_counter()
+        outcome = continuation(client_call_details, request)
+
+        def record(future):
+            latency_ms = (time.perf_counter() - start) * 1_000
+            if future.exception() is None:
+                self.statistics.record(method, latency_ms, False, request.ByteSize(), future.result().ByteSize())
+            else:
+                self.statistics.record(method, latency_ms, True, request.ByteSize(), 0)
+        outcome.add_done_callback(record)
+        return outcome
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        return RecordedStream(
+            continuation(client_call_details, request),
+            lambda latency_ms, error, response_bytes:
+                self.statistics.record(method, latency_ms, error, request.ByteSize(), response_bytes)
+        )
+
+
+class RecordedStream:
+    def __init__(self, call, record):
+        self.call = call
+        self.record = record
+        self.start = time.perf_counter()
+        self.response_bytes = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            response = next(self.call)
+        except StopIteration:
+            self.record((time.perf_counter() - self.start) * 1_000, False, self.response_bytes)
+            raise
+        except grpc.RpcError:
+            self.record((time.perf_counter() - self.start) * 1_000, True, self.response_bytes)
+            raise
+        self.response_bytes += response.ByteSize()
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.call, name)
+
+
+class AsyncRpcStatisticsInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    def __init__(self, statistics):
+        self.statistics = statistics
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = get_method_name(client_call_details.method)
+        start = time.perf_counter()
+        call = await continuation(client_call_details, request)
+        try:
+            response = await call
+        except grpc.RpcError:
+            self.statistics.record(method, (time.perf_counter() - start) * 1_000, True, request.ByteSize(), 0)
+            raise
+        latency_ms = (time.perf_counter() - start) * 1_000
+        self.statistics.record(method, latency_ms, False, request.ByteSize(), response.ByteSize())
+        return response
+
+
+def get_method_name(full_method_name):
+    # "/lnrpc.Lightning/GetInfo" becomes "Lightning/GetInfo"
+    if isinstance(full_method_name, bytes):
+        full_method_name = full_method_name.decode()
+    return full_method_name.rsplit(".", 1)[-1]
+
+
+def get_bucket(latency_ms):
+    for bucket, upper_bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= upper_bound:
+            return bucket
+    return len(LATENCY_BUCKETS_MS)
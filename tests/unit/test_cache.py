@@ -0,0 +1,70 @@
+import unittest
+
+from cache import Cache, cache_key, cached
+
+
+class Counter:
+    def __init__(self):
+        self.caches = {"get_value": Cache(max_size=2)}
+        self.calls = 0
+
+    @cached("get_value")
+    def get_value(self, value, factor=1):
+        self.calls += 1
+        return value * factor
+
+
+class TestCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        """Verifies hit and miss counters"""
+        cache = Cache()
+        cache.put("a", 1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_max_size(self):
+        """Verifies the least recently used entry is evicted"""
+        cache = Cache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        """Verifies expired entries are not returned"""
+        cache = Cache(ttl=-1)
+        cache.put("a", 1)
+
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.get("a", "default"), "default")
+
+    def test_invalidate(self):
+        """Verifies selective invalidation"""
+        cache = Cache()
+        cache.update({"a": 1, "b": 2})
+        cache.invalidate("a")
+
+        self.assertNotIn("a", cache)
+        self.assertIn("b", cache)
+
+    def test_cached_method(self):
+        """Verifies results are cached per instance and per arguments"""
+        counter1 = Counter()
+        counter2 = Counter()
+
+        self.assertEqual(counter1.get_value(2), 2)
+        self.assertEqual(counter1.get_value(2), 2)
+        self.assertEqual(counter1.get_value(2, factor=3), 6)
+        self.assertEqual(counter2.get_value(2), 2)
+
+        self.assertEqual(counter1.calls, 2)
+        self.assertEqual(counter2.calls, 1)
+        self.assertIn(cache_key(2), counter1.caches["get_value"])
@@ -0,0 +1,90 @@
+import unittest
+
+from channels import ChannelTracker
+from grpc_generated import lightning_pb2 as ln
+
+
+def get_channel(chan_id, active=True, private=False, local_balance=0, remote_balance=0, remote_pubkey="02aa"):
+    return ln.Channel(
+        chan_id=chan_id,
+        remote_pubkey=remote_pubkey,
+        active=active,
+        private=private,
+        channel_point=f"{chan_id:02x}:0",
+        local_balance=local_balance,
+        remote_balance=remote_balance,
+    )
+
+
+class TestChannelTracker(unittest.TestCase):
+    def test_get_channels(self):
+        """Verifies the filtered views"""
+        tracker = ChannelTracker([
+            get_channel(1),
+            get_channel(2, active=False),
+            get_channel(3, private=True),
+        ])
+
+        self.assertEqual([c.chan_id for c in tracker.get_channels()], [1, 2, 3])
+        self.assertEqual([c.chan_id for c in tracker.get_channels(active_only=True)], [1, 3])
+        self.assertEqual([c.chan_id for c in tracker.get_channels(public_only=True)], [1, 2])
+        self.assertEqual([c.chan_id for c in tracker.get_channels(private_only=True)], [3])
+
+    def test_get_peer_channels(self):
+        """Verifies the channels are indexed by peer, also for opened and closed channels"""
+        tracker = ChannelTracker([get_channel(1), get_channel(2, remote_pubkey="02bb"), get_channel(3)])
+
+        tracker.apply_event(ln.ChannelEventUpdate(
+            type=ln.ChannelEventUpdate.OPEN_CHANNEL, open_channel=get_channel(4, remote_pubkey="02bb")
+        ))
+        tracker.apply_event(ln.ChannelEventUpdate(
+            type=ln.ChannelEventUpdate.CLOSED_CHANNEL, closed_channel=ln.ChannelCloseSummary(chan_id=3)
+        ))
+
+        self.assertEqual([1], [c.chan_id for c in tracker.get_peer_channels("02aa")])
+        self.assertEqual([2, 4], sorted(c.chan_id for c in tracker.get_peer_channels("02bb")))
+        self.assertEqual([], tracker.get_peer_channels("02cc"))
+
+    def test_open_and_close(self):
+        """Verifies opened channels are added and closed channels are removed"""
+        tracker = ChannelTracker([get_channel(1)])
+
+        tracker.apply_event(ln.ChannelEventUpdate(
+            type=ln.ChannelEventUpdate.OPEN_CHANNEL, open_channel=get_channel(2)
+        ))
+        tracker.apply_event(ln.ChannelEventUpdate(
+            type=ln.ChannelEventUpdate.CLOSED_CHANNEL, closed_channel=ln.ChannelCloseSummary(chan_id=1)
+        ))
+
+        self.assertIsNone(tracker.get_channel(1))
+        self.assertEqual(tracker.get_channel(2).chan_id, 2)
+
+    def test_inactive(self):
+        """Verifies the active flag is updated based on the channel point"""
+        tracker = ChannelTracker([get_channel(1)])
+
+        tracker.apply_event(ln.ChannelEventUpdate(
+            type=ln.ChannelEventUpdate.INACTIVE_CHANNEL,
+            inactive_channel=ln.ChannelPoint(funding_txid_str="01", output_index=0),
+        ))
+
+        self.assertFalse(tracker.get_channel(1).active)
+
+    def test_apply_route(self):
+        """Verifies balances are moved for the first and last hop of a successful route"""
+        tracker = ChannelTracker([
+            get_channel(1, local_balance=1_000, remote_balance=0),
+            get_channel(2, local_balance=0, remote_balance=1_000),
+        ])
+        route = ln.Route(total_amt=101, hops=[
+            ln.Hop(chan_id=1, amt_to_forward=100),
+            ln.Hop(chan_id=3, amt_to_forward=100),
+            ln.Hop(chan_id=2, amt_to_forward=100),
+        ])
+
+        tracker.apply_route(route)
+
+        self.assertEqual(tracker.get_channel(1).local_balance, 899)
+        self.assertEqual(tracker.get_channel(1).remote_balance, 101)
+        self.assertEqual(tracker.get_channel(2).local_balance, 100)
+        self.assertEqual(tracker.get_channel(2).remote_balance, 900)
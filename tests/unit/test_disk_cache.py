@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_values_survive_reopening(self):
+        """Verifies values are persisted across instances"""
+        cache = DiskCache(self.path)
+        cache.put("alias", "pubkey", "alias")
+        cache.put_many("edge", {1: b"edge1", 2: b"edge2"})
+        cache.close()
+
+        cache = DiskCache(self.path)
+        self.assertEqual(cache.get("alias", "pubkey"), "alias")
+        self.assertEqual(cache.get_many("edge", [1, 2, 3]), {1: b"edge1", 2: b"edge2"})
+        cache.close()
+
+    def test_expired_values_are_ignored(self):
+        """Verifies the TTL is applied per entry type"""
+        cache = DiskCache(self.path, edge_ttl=-1)
+        cache.put("edge", 1, b"edge")
+        cache.put("alias", "pubkey", "alias")
+
+        self.assertIsNone(cache.get("edge", 1))
+        self.assertEqual(cache.get("alias", "pubkey"), "alias")
+        cache.close()
+
+    def test_invalidate(self):
+        """Verifies a single entry can be removed"""
+        cache = DiskCache(self.path)
+        cache.put_many("edge", {1: b"edge1", 2: b"edge2"})
+        cache.invalidate("edge", 1)
+
+        self.assertIsNone(cache.get("edge", 1))
+        self.assertEqual(cache.get("edge", 2), b"edge2")
+        cache.close()
+
+    def test_get_all(self):
+        """Verifies all valid entries of a type are returned"""
+        cache = DiskCache(self.path, pair_ttl=-1)
+        cache.put_many("edge", {1: b"edge1", 2: b"edge2"})
+        cache.put("pair", "a:b", b"pair")
+
+        self.assertEqual(cache.get_all("edge"), {"1": b"edge1", "2": b"edge2"})
+        self.assertEqual(cache.get_all("pair"), {})
+        cache.close()
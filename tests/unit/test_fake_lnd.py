@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+import unittest
+
+from fake_lnd import FakeLnd, create_lnd_dir, generate_graph, get_fee_msat, start_server
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd
+
+AMOUNT_MSAT = 100_000_000
+
+
+class TestFakeLnd(unittest.TestCase):
+    def setUp(self):
+        self.graph = generate_graph(200, 800, 10, seed=1)
+        self.fake_lnd = FakeLnd(self.graph)
+        self.own_pubkey = self.graph.own_pubkey
+        # routes only consider the capacity of remote channels, make sure the payments do not fail
+        for channel in self.graph.channels.values():
+            if self.own_pubkey not in (channel.node1_pub, channel.node2_pub):
+                channel.node1_balance_msat = channel.capacity * 500
+        channels = sorted(self.graph.get_own_channels(), key=lambda c: -c.get_balance_msat(self.own_pubkey))
+        self.first_channel = channels[0]
+        self.last_channel = channels[-1]
+        self.last_hop_pubkey = self.last_channel.get_peer(self.own_pubkey)
+
+    def find_route(self, **kwargs):
+        return self.graph.find_route(
+            self.own_pubkey, AMOUNT_MSAT, self.last_hop_pubkey, self.first_channel.chan_id, **kwargs
+        )
+
+    def test_generate_graph(self):
+        """Verifies the generated graph has the requested size and is reproducible"""
+        self.assertEqual(200, len(self.graph.aliases))
+        self.assertEqual(800, len(self.graph.channels))
+        self.assertEqual(10, len(self.graph.get_own_channels()))
+        self.assertEqual(sorted(self.graph.channels), sorted(generate_graph(200, 800, 10, seed=1).channels))
+
+    def test_find_route(self):
+        """Verifies the route starts and ends with the requested channels and includes all fees"""
+        route = self.find_route()
+
+        self.assertEqual(self.first_channel.chan_id, route.hops[0].chan_id)
+        self.assertEqual(self.last_channel.chan_id, route.hops[-1].chan_id)
+        self.assertEqual(self.own_pubkey, route.hops[-1].pub_key)
+        self.assertEqual(AMOUNT_MSAT, route.hops[-1].amt_to_forward_msat)
+        self.assertEqual(sum(hop.fee_msat for hop in route.hops), route.total_fees_msat)
+        self.assertEqual(AMOUNT_MSAT + route.total_fees_msat, route.total_amt_msat)
+        for hop, next_hop in zip(route.hops, route.hops[1:]):
+            policy = self.graph.channels[next_hop.chan_id].get_policy(hop.pub_key)
+            self.assertEqual(get_fee_msat(policy, hop.amt_to_forward_msat), hop.fee_msat)
+
+    def test_find_route_ignored_node(self):
+        """Verifies ignored nodes are not part of the route"""
+        ignored = self.find_route().hops[1].pub_key
+
+        route = self.find_route(ignored_nodes=[ignored])
+
+        self.assertNotIn(ignored, [hop.pub_key for hop in route.hops])
+
+    def test_find_route_fee_limit(self):
+        """Verifies no route is returned if the fee limit is too low"""
+        route = self.find_route()
+
+        self.assertIsNone(self.find_route(fee_limit_msat=route.total_fees_msat - 1))
+
+    def test_send_to_route(self):
+        """Verifies a successful payment moves the liquidity and settles the invoice"""
+        route = self.find_route()
+        invoice = self.fake_lnd.add_invoice(ln.Invoice(value=AMOUNT_MSAT // 1_000))
+        first_balance_msat = self.first_channel.get_balance_msat(self.own_pubkey)
+        last_balance_msat = self.last_channel.get_balance_msat(self.own_pubkey)
+
+        response = self.fake_lnd.send_to_route(invoice.r_hash, route)
+
+        self.assertEqual(0, response.failure.code)
+        self.assertEqual(
+            first_balance_msat - route.total_amt_msat, self.first_channel.get_balance_msat(self.own_pubkey)
+        )
+        self.assertEqual(last_balance_msat + AMOUNT_MSAT, self.last_channel.get_balance_msat(self.own_pubkey))
+        response = self.fake_lnd.send_to_route(invoice.r_hash, route)
+        self.assertEqual(ln.Failure.INCORRECT_OR_UNKNOWN_PAYMENT_DETAILS, response.failure.code)
+
+    def test_send_to_route_insufficient_liquidity(self):
+        """Verifies a payment fails if a channel on the route does not have enough liquidity"""
+        route = self.find_route()
+        invoice = self.fake_lnd.add_invoice(ln.Invoice(value=AMOUNT_MSAT // 1_000))
+        sender = route.hops[1].pub_key
+        channel = self.graph.channels[route.hops[2].chan_id]
+        channel.move_balance(sender, channel.get_balance_msat(sender))
+
+        response = self.fake_lnd.send_to_route(invoice.r_hash, route)
+
+        self.assertEqual(ln.Failure.TEMPORARY_CHANNEL_FAILURE, response.failure.code)
+        self.assertEqual(2, response.failure.failure_source_index)
+
+    @unittest.skipUnless(shutil.which("openssl"), "openssl is required to create the TLS certificate")
+    def test_lnd(self):
+        """Verifies Lnd can connect to the fake server and pay an invoice"""
+        with tempfile.TemporaryDirectory() as lnd_dir:
+            create_lnd_dir(lnd_dir, "regtest")
+            server, port = start_server(self.fake_lnd, lnd_dir)
+            try:
+                lnd = Lnd(lnd_dir, f"localhost:{port}", "regtest")
+                self.assertEqual(self.own_pubkey, lnd.get_own_pubkey())
+                self.assertEqual(10, len(lnd.get_channels()))
+                payment_request = lnd.generate_invoice("test", AMOUNT_MSAT // 1_000)
+                routes = lnd.get_route(
+                    self.last_hop_pubkey, AMOUNT_MSAT // 1_000, [], [], self.first_channel.chan_id, None
+                )
+                attempt = lnd.start_payment(payment_request, routes[0])
+                self.assertEqual(ln.HTLCAttempt.SUCCEEDED, attempt.result().status)
+                self.assertEqual(ln.HTLCAttempt.SUCCEEDED, attempt.track().status)
+            finally:
+                server.stop(None)
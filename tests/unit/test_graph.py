@@ -0,0 +1,115 @@
+import unittest
+
+from graph import ChannelGraph
+from grpc_generated import lightning_pb2 as ln
+
+
+class TestChannelGraph(unittest.TestCase):
+    def test_get_edge(self):
+        """Verifies edges are indexed by channel ID"""
+        edge1 = ln.ChannelEdge(channel_id=1, node1_pub="a", node2_pub="b")
+        edge2 = ln.ChannelEdge(channel_id=2, node1_pub="b", node2_pub="c")
+        graph = ChannelGraph([edge1, edge2])
+
+        self.assertEqual(graph.get_edge(1), edge1)
+        self.assertEqual(graph.get_edge(2), edge2)
+        self.assertIsNone(graph.get_edge(3))
+
+    def test_has_edge(self):
+        """Verifies lookup of known and unknown channels"""
+        graph = ChannelGraph([ln.ChannelEdge(channel_id=1)])
+
+        self.assertTrue(graph.has_edge(1))
+        self.assertFalse(graph.has_edge(2))
+
+    def test_apply_policy_update(self):
+        """Verifies policy updates are applied for the advertising node"""
+        edge = ln.ChannelEdge(channel_id=1, node1_pub="a", node2_pub="b", capacity=100)
+        graph = ChannelGraph([edge])
+        update = ln.GraphTopologyUpdate(channel_updates=[ln.ChannelEdgeUpdate(
+            chan_id=1,
+            capacity=100,
+            advertising_node="b",
+            connecting_node="a",
+            routing_policy=ln.RoutingPolicy(fee_rate_milli_msat=123, last_update=10),
+        )])
+
+        graph.apply_update(update)
+
+        self.assertEqual(graph.get_edge(1).node2_policy.fee_rate_milli_msat, 123)
+        self.assertEqual(graph.get_edge(1).node1_policy.fee_rate_milli_msat, 0)
+        self.assertEqual(edge.node2_policy.fee_rate_milli_msat, 0)
+
+    def test_ignore_outdated_policy_update(self):
+        """Verifies older policies do not replace newer ones"""
+        edge = ln.ChannelEdge(
+            channel_id=1, node1_pub="a", node2_pub="b",
+            node1_policy=ln.RoutingPolicy(fee_rate_milli_msat=100, last_update=20),
+        )
+        graph = ChannelGraph([edge])
+        update = ln.GraphTopologyUpdate(channel_updates=[ln.ChannelEdgeUpdate(
+            chan_id=1,
+            advertising_node="a",
+            connecting_node="b",
+            routing_policy=ln.RoutingPolicy(fee_rate_milli_msat=50, last_update=10),
+        )])
+
+        graph.apply_update(update)
+
+        self.assertEqual(graph.get_edge(1).node1_policy.fee_rate_milli_msat, 100)
+
+    def test_apply_new_channel(self):
+        """Verifies new channels are added with sorted node keys"""
+        graph = ChannelGraph([])
+        update = ln.GraphTopologyUpdate(channel_updates=[ln.ChannelEdgeUpdate(
+            chan_id=1,
+            chan_point=ln.ChannelPoint(funding_txid_bytes=bytes([1, 2]), output_index=3),
+            capacity=100,
+            advertising_node="b",
+            connecting_node="a",
+            routing_policy=ln.RoutingPolicy(fee_rate_milli_msat=1),
+        )])
+
+        graph.apply_update(update)
+
+        edge = graph.get_edge(1)
+        self.assertEqual(edge.node1_pub, "a")
+        self.assertEqual(edge.node2_pub, "b")
+        self.assertEqual(edge.chan_point, "0201:3")
+        self.assertEqual(edge.node2_policy.fee_rate_milli_msat, 1)
+
+    def test_apply_closed_channel(self):
+        """Verifies closed channels are removed"""
+        graph = ChannelGraph([ln.ChannelEdge(channel_id=1), ln.ChannelEdge(channel_id=2)])
+
+        graph.apply_update(ln.GraphTopologyUpdate(closed_chans=[ln.ClosedChannelUpdate(chan_id=1)]))
+
+        self.assertFalse(graph.has_edge(1))
+        self.assertTrue(graph.has_edge(2))
+
+    def test_get_peers(self):
+        """Verifies the peers are taken from the channels of the node, including new and without closed channels"""
+        graph = ChannelGraph([
+            ln.ChannelEdge(channel_id=1, node1_pub="a", node2_pub="b"),
+            ln.ChannelEdge(channel_id=2, node1_pub="a", node2_pub="b"),
+            ln.ChannelEdge(channel_id=3, node1_pub="b", node2_pub="c"),
+        ])
+
+        graph.apply_update(ln.GraphTopologyUpdate(
+            channel_updates=[ln.ChannelEdgeUpdate(chan_id=4, advertising_node="d", connecting_node="b")],
+            closed_chans=[ln.ClosedChannelUpdate(chan_id=3)],
+        ))
+
+        self.assertEqual({"a", "d"}, graph.get_peers("b"))
+        self.assertEqual(set(), graph.get_peers("c"))
+        self.assertEqual(set(), graph.get_peers("e"))
+
+    def test_aliases(self):
+        """Verifies aliases are taken from the nodes and from node updates"""
+        graph = ChannelGraph([], [ln.LightningNode(pub_key="a", alias="alias a")])
+
+        graph.apply_update(ln.GraphTopologyUpdate(node_updates=[ln.NodeUpdate(identity_key="b", alias="alias b")]))
+
+        self.assertEqual(graph.get_alias("a"), "alias a")
+        self.assertEqual(graph.get_alias("b"), "alias b")
+        self.assertIsNone(graph.get_alias("c"))
@@ -0,0 +1,54 @@
+import threading
+import unittest
+
+from grpc_generated import lightning_pb2 as ln
+from invoice_pool import InvoicePool
+
+
+class FakeLnd:
+    def __init__(self):
+        self.generated = []
+        self.cancelled = []
+        self.threads = []
+
+    def generate_invoice(self, memo, amount):
+        self.threads.append(threading.current_thread())
+        payment_hash = f"{len(self.generated):064x}"
+        self.generated.append(payment_hash)
+        return ln.PayReq(payment_hash=payment_hash, num_satoshis=amount, description=memo)
+
+    def cancel_invoice(self, payment_hash):
+        self.cancelled.append(payment_hash)
+
+
+class TestInvoicePool(unittest.TestCase):
+    def setUp(self):
+        self.lnd = FakeLnd()
+        self.pool = InvoicePool(self.lnd)
+
+    def test_prepared_invoice(self):
+        """Verifies prepared invoices are created in the background and handed out"""
+        self.pool.prepare("memo", 100)
+
+        payment_request = self.pool.get("memo", 100)
+
+        self.assertEqual(100, payment_request.num_satoshis)
+        self.assertEqual(1, len(self.lnd.generated))
+        self.assertIsNot(threading.current_thread(), self.lnd.threads[0])
+
+    def test_get_without_prepared_invoice(self):
+        """Verifies an invoice is created if none was prepared for the amount"""
+        self.pool.prepare("memo", 100)
+
+        payment_request = self.pool.get("memo", 200)
+
+        self.assertEqual(200, payment_request.num_satoshis)
+
+    def test_close_cancels_unused_invoices(self):
+        """Verifies invoices that were not handed out are cancelled"""
+        self.pool.prepare("memo", 100, count=2)
+        used = self.pool.get("memo", 100)
+
+        self.pool.close()
+
+        self.assertEqual([h for h in self.lnd.generated if h != used.payment_hash], self.lnd.cancelled)
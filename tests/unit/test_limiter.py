@@ -0,0 +1,111 @@
+import time
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+import grpc
+
+from limiter import RATE_LIMITS, BudgetExceededError, ConcurrencyLimit, RpcLimiter, RpcLimiterInterceptor, TokenBucket
+from recording import ReplayError, ReplayOutcome
+
+CallDetails = namedtuple("CallDetails", ["method", "timeout"])
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst(self):
+        """Verifies requests within the burst do not need to wait"""
+        bucket = TokenBucket(10, 3)
+
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+
+    def test_rate(self):
+        """Verifies requests exceeding the burst wait according to the rate"""
+        bucket = TokenBucket(10, 1)
+        bucket.reserve()
+
+        self.assertAlmostEqual(0.1, bucket.reserve(), places=2)
+        self.assertAlmostEqual(0.2, bucket.reserve(), places=2)
+
+
+class TestConcurrencyLimit(unittest.TestCase):
+    def test_acquire(self):
+        """Verifies no more than the limit of requests may be sent in parallel"""
+        limit = ConcurrencyLimit(2)
+
+        self.assertEqual([True, True, False], [limit.try_acquire() for _ in range(3)])
+
+    def test_decrease_on_overload(self):
+        """Verifies the limit is halved once for all requests sent before lnd reported an overload"""
+        limit = ConcurrencyLimit(8)
+        start = time.monotonic()
+        for _ in range(4):
+            limit.try_acquire()
+
+        for _ in range(4):
+            limit.release("Lightning/GetChanInfo", start, True)
+
+        self.assertEqual(4, limit.get_limit())
+
+    def test_decrease_on_slow_response(self):
+        """Verifies the limit is decreased if a response takes much longer than the fastest one"""
+        limit = ConcurrencyLimit(8)
+        limit.try_acquire()
+        limit.release("Lightning/GetChanInfo", time.monotonic() - 0.1, False)
+        limit.try_acquire()
+
+        limit.release("Lightning/GetChanInfo", time.monotonic() - 1, False)
+
+        self.assertEqual(4, limit.get_limit())
+
+    def test_increase(self):
+        """Verifies the limit increases again if responses are fast"""
+        limit = ConcurrencyLimit(8)
+        limit.try_acquire()
+        limit.release("Lightning/GetChanInfo", time.monotonic(), True)
+        for _ in range(8):
+            limit.try_acquire()
+            limit.release("Lightning/GetChanInfo", time.monotonic(), False)
+
+        self.assertEqual(5, limit.get_limit())
+
+
+class TestRpcLimiter(unittest.TestCase):
+    def test_budget(self):
+        """Verifies requests fail once the budget is exhausted, except for cancelling invoices"""
+        limiter = RpcLimiter(10, budget=2)
+        limiter.charge("Lightning/GetInfo")
+        limiter.charge("Lightning/QueryRoutes")
+
+        with self.assertRaises(BudgetExceededError):
+            limiter.charge("Lightning/QueryRoutes")
+        limiter.charge("Invoices/CancelInvoice")
+
+    @mock.patch("limiter.time.sleep")
+    def test_interceptor(self, sleep):
+        """Verifies the interceptor waits for a token and releases the concurrency limit once done"""
+        limiter = RpcLimiter(1, rate_limits={"routing": (10, 1)})
+        interceptor = RpcLimiterInterceptor(limiter)
+        details = CallDetails("/lnrpc.Lightning/QueryRoutes", None)
+
+        interceptor.intercept_unary_unary(lambda *_: ReplayOutcome("route"), details, None)
+        interceptor.intercept_unary_unary(
+            lambda *_: ReplayError(grpc.StatusCode.RESOURCE_EXHAUSTED, "overloaded"), details, None
+        )
+
+        self.assertEqual(0, limiter.concurrency.in_flight)
+        self.assertEqual(1, sleep.call_count)
+        self.assertAlmostEqual(0.1, sleep.call_args[0][0], places=2)
+
+    @mock.patch("limiter.time.sleep")
+    def test_no_rate_limit_by_default(self, sleep):
+        """Verifies lookups exceeding the burst of the rate limit are not delayed unless rate limits are enabled"""
+        limiter = RpcLimiter(4)
+        interceptor = RpcLimiterInterceptor(limiter)
+        details = CallDetails("/lnrpc.Lightning/GetChanInfo", None)
+        burst = RATE_LIMITS["lookup"][1]
+
+        for _ in range(2 * burst):
+            interceptor.intercept_unary_unary(lambda *_: ReplayOutcome("edge"), details, None)
+
+        sleep.assert_not_called()
+        self.assertEqual(0, limiter.concurrency.in_flight)
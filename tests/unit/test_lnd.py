@@ -0,0 +1,215 @@
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+import unittest
+
+import grpc
+
+from fake_lnd import FakeLnd, create_lnd_dir, generate_graph, start_server
+from grpc_generated import lightning_pb2 as ln
+from lnd import INVOICE_CLTV_EXPIRY, Lnd
+
+TIMEOUT = 5
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is required to create the TLS certificate")
+class TestLnd(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = generate_graph(100, 400, 10, seed=1)
+        cls.lnd_dir = tempfile.TemporaryDirectory()
+        create_lnd_dir(cls.lnd_dir.name, "regtest")
+        cls.fake_lnd = FakeLnd(cls.graph)
+        cls.server, cls.port = start_server(cls.fake_lnd, cls.lnd_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop(None)
+        cls.lnd_dir.cleanup()
+
+    def setUp(self):
+        self.lnd = Lnd(self.lnd_dir.name, f"localhost:{self.port}", "regtest")
+        self.own_channels = self.graph.get_own_channels()
+
+    def get_calls(self, method):
+        statistics = self.lnd.get_rpc_statistics().get(method)
+        return statistics.calls if statistics is not None else 0
+
+    def test_get_channel_without_loading_all_channels(self):
+        """Verifies a single channel is loaded using the peer filter"""
+        channel_id = self.own_channels[0].chan_id
+
+        channel = self.lnd.get_channel(channel_id)
+
+        self.assertEqual(channel_id, channel.chan_id)
+        self.assertEqual(1, self.get_calls("Lightning/ListChannels"))
+        self.assertEqual(1, self.get_calls("Lightning/GetChanInfo"))
+
+    def test_get_channel_of_other_node(self):
+        """Verifies None is returned for channels that are not our own"""
+        own_channel_ids = {channel.chan_id for channel in self.own_channels}
+        channel_id = next(chan_id for chan_id in self.graph.channels if chan_id not in own_channel_ids)
+
+        self.assertIsNone(self.lnd.get_channel(channel_id))
+
+    def test_get_channels_single_snapshot(self):
+        """Verifies the filtered views of the channels are computed from a single request"""
+        self.assertEqual(10, len(self.lnd.get_channels()))
+        self.assertEqual(10, len(self.lnd.get_channels(active_only=True)))
+        self.assertEqual(10, len(self.lnd.get_channels(active_only=True, public_only=True)))
+        self.assertEqual(0, len(self.lnd.get_channels(active_only=True, private_only=True)))
+
+        self.assertEqual(1, self.get_calls("Lightning/ListChannels"))
+
+    def test_generate_invoice(self):
+        """Verifies the invoice is not decoded by lnd, but matches the decoded invoice"""
+        payment_request = self.lnd.generate_invoice("memo", 1_234)
+
+        self.assertEqual(0, self.get_calls("Lightning/DecodePayReq"))
+        invoice = self.fake_lnd.invoices[bytes.fromhex(payment_request.payment_hash)]
+        decoded = self.fake_lnd.decode_payment_request(invoice["payment_request"])
+        fields = [
+            "destination", "payment_hash", "num_satoshis", "num_msat", "expiry", "description", "cltv_expiry",
+            "payment_addr",
+        ]
+        for field in fields:
+            self.assertEqual(getattr(decoded, field), getattr(payment_request, field))
+        self.assertEqual(INVOICE_CLTV_EXPIRY, payment_request.cltv_expiry)
+
+    def test_get_ppm_to_own_channels(self):
+        """Verifies the fee rates of all own channels are loaded with a single FeeReport request"""
+        for channel in self.own_channels:
+            expected = channel.get_policy(self.graph.own_pubkey).fee_rate_milli_msat
+            self.assertEqual(expected, self.lnd.get_ppm_to(channel.chan_id))
+
+        self.assertEqual(1, self.get_calls("Lightning/FeeReport"))
+        self.assertEqual(0, self.get_calls("Lightning/GetChanInfo"))
+
+    def test_get_policy_to_channel_missing_in_fee_report(self):
+        """Verifies the policy is taken from the channel edge if the channel is not part of the fee report"""
+        channel = self.own_channels[0]
+        del self.lnd.get_own_policies()[channel.chan_id]
+
+        policy = self.lnd.get_policy_to(channel.chan_id)
+
+        self.assertEqual(channel.get_policy(self.graph.own_pubkey), policy)
+        self.assertEqual(1, self.get_calls("Lightning/FeeReport"))
+        self.assertEqual(1, self.get_calls("Lightning/GetChanInfo"))
+
+    def test_get_channel_uses_loaded_channels(self):
+        """Verifies the channels are not requested again if all of them were loaded already"""
+        self.lnd.get_channels()
+        calls = self.get_calls("Lightning/ListChannels")
+
+        channel = self.lnd.get_channel(self.own_channels[1].chan_id)
+
+        self.assertEqual(self.own_channels[1].chan_id, channel.chan_id)
+        self.assertEqual(calls, self.get_calls("Lightning/ListChannels"))
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is required to create the TLS certificate")
+class TestLndSubscriptions(unittest.TestCase):
+    def setUp(self):
+        # each test modifies the graph of the fake node
+        self.graph = generate_graph(100, 400, 10, seed=1)
+        self.fake_lnd = FakeLnd(self.graph)
+        lnd_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lnd_dir.cleanup)
+        create_lnd_dir(lnd_dir.name, "regtest")
+        server, port = start_server(self.fake_lnd, lnd_dir.name)
+        self.addCleanup(server.stop, None)
+        self.lnd = Lnd(lnd_dir.name, f"localhost:{port}", "regtest")
+        self.own_pubkey = self.graph.own_pubkey
+        self.own_channels = list(self.graph.get_own_channels())
+
+    def test_channel_graph_updates(self):
+        """Verifies policy updates and closed channels received from lnd are reflected by the graph"""
+        self.lnd.subscribe_channel_graph()
+        self.addCleanup(self.lnd.unsubscribe_channel_graph)
+        wait_until(lambda: self.fake_lnd.graph_subscribers)
+        channel = self.own_channels[0]
+        peer = channel.get_peer(self.own_pubkey)
+        policy = ln.RoutingPolicy()
+        policy.CopyFrom(channel.get_policy(peer))
+        policy.fee_rate_milli_msat += 123
+        policy.last_update += 1
+        other_channel_id = next(chan_id for chan_id in self.graph.channels if chan_id != channel.chan_id)
+
+        self.fake_lnd.update_policy(channel.chan_id, peer, policy)
+        self.fake_lnd.close_channel(other_channel_id)
+
+        wait_until(lambda: not self.lnd.get_graph().has_edge(other_channel_id))
+        self.assertEqual(policy.fee_rate_milli_msat, self.lnd.get_ppm_from(channel.chan_id))
+        with self.assertRaises(grpc.RpcError), contextlib.redirect_stdout(io.StringIO()):
+            self.lnd.get_edge(other_channel_id)
+        # the updated policy is taken from the graph, only the closed channel is requested (and not found)
+        self.assertEqual(1, self.get_calls("Lightning/GetChanInfo"))
+
+    def test_unsubscribe_channel_graph(self):
+        """Verifies the updates are no longer applied once unsubscribed, and the thread stops without an error"""
+        self.lnd.subscribe_channel_graph()
+        wait_until(lambda: self.fake_lnd.graph_subscribers)
+        thread = self.lnd.graph_updates_thread
+        channel_id = self.own_channels[0].chan_id
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.lnd.unsubscribe_channel_graph()
+        self.fake_lnd.close_channel(channel_id)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual("", output.getvalue())
+        wait_until(lambda: not self.fake_lnd.graph_subscribers)
+        self.assertTrue(self.lnd.get_graph().has_edge(channel_id))
+
+    def test_channel_events(self):
+        """Verifies opened, inactive and closed channels reported by lnd are reflected by the tracked channels"""
+        self.lnd.subscribe_channel_events()
+        self.addCleanup(self.lnd.unsubscribe_channel_events)
+        wait_until(lambda: self.fake_lnd.channel_event_subscribers)
+        peer = self.own_channels[0].get_peer(self.own_pubkey)
+        inactive_channel_id = self.own_channels[1].chan_id
+        closed_channel_id = self.own_channels[2].chan_id
+
+        opened_channel = self.fake_lnd.open_channel(peer, 1_000_000, 400_000)
+        self.fake_lnd.set_active(inactive_channel_id, False)
+        self.fake_lnd.close_channel(closed_channel_id)
+
+        wait_until(lambda: self.lnd.get_channel(closed_channel_id) is None)
+        channel = self.lnd.get_channel(opened_channel.chan_id)
+        self.assertEqual(peer, channel.remote_pubkey)
+        self.assertEqual(400_000, channel.local_balance)
+        self.assertFalse(self.lnd.get_channel(inactive_channel_id).active)
+        active_channel_ids = {channel.chan_id for channel in self.lnd.get_channels(active_only=True)}
+        expected = {channel.chan_id for channel in self.own_channels} | {opened_channel.chan_id}
+        self.assertEqual(expected - {inactive_channel_id, closed_channel_id}, active_channel_ids)
+        # everything is taken from the tracked channels, which are loaded once when subscribing
+        self.assertEqual(1, self.get_calls("Lightning/ListChannels"))
+
+    def test_unsubscribe_channel_events(self):
+        """Verifies the events are no longer applied once unsubscribed, and the thread stops without an error"""
+        self.lnd.subscribe_channel_events()
+        wait_until(lambda: self.fake_lnd.channel_event_subscribers)
+        thread = self.lnd.channel_events_thread
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.lnd.unsubscribe_channel_events()
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual("", output.getvalue())
+        wait_until(lambda: not self.fake_lnd.channel_event_subscribers)
+
+    def get_calls(self, method):
+        statistics = self.lnd.get_rpc_statistics().get(method)
+        return statistics.calls if statistics is not None else 0
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        time.sleep(0.01)
@@ -0,0 +1,138 @@
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+import grpc
+
+from fake_lnd import FakeLnd, create_lnd_dir, generate_graph, start_server
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd
+from lnd_async import AsyncLnd
+
+
+class ConcurrencyInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    # counts the requests in flight, each request is delayed so that requests sent in parallel overlap
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await (await continuation(client_call_details, request))
+        finally:
+            self.in_flight -= 1
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is required to create the TLS certificate")
+class TestAsyncLnd(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = generate_graph(100, 400, 10, seed=1)
+        cls.lnd_dir = tempfile.TemporaryDirectory()
+        create_lnd_dir(cls.lnd_dir.name, "regtest")
+        cls.server, cls.port = start_server(FakeLnd(cls.graph), cls.lnd_dir.name)
+        cls.channel_ids = sorted(cls.graph.channels)[:30]
+        cls.pub_keys = sorted(cls.graph.aliases)[:30]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop(None)
+        cls.lnd_dir.cleanup()
+
+    def run_async_lnd(self, function, concurrency=4, port=None):
+        interceptor = ConcurrencyInterceptor()
+
+        async def run():
+            async with AsyncLnd(
+                self.lnd_dir.name, f"localhost:{port or self.port}", "regtest", concurrency, [interceptor]
+            ) as async_lnd:
+                return await function(async_lnd)
+        return asyncio.run(run()), interceptor
+
+    def create_lnd(self, concurrency):
+        lnd = Lnd(self.lnd_dir.name, f"localhost:{self.port}", "regtest", concurrency=concurrency)
+        self.addCleanup(lnd.close_async)
+        return lnd
+
+    def get_calls(self, lnd, method):
+        statistics = lnd.get_rpc_statistics().get(method)
+        return statistics.calls if statistics is not None else 0
+
+    def test_get_edges(self):
+        """Verifies all edges are loaded, with no more than the configured number of requests in parallel"""
+        edges, interceptor = self.run_async_lnd(lambda async_lnd: async_lnd.get_edges(self.channel_ids), 4)
+
+        self.assertEqual(set(self.channel_ids), set(edges))
+        for channel_id, edge in edges.items():
+            self.assertEqual(self.graph.channels[channel_id].to_edge(), edge)
+        self.assertEqual(len(self.channel_ids), interceptor.calls)
+        self.assertEqual(4, interceptor.max_in_flight)
+
+    def test_get_node_aliases(self):
+        """Verifies all aliases are loaded, with no more than the configured number of requests in parallel"""
+        aliases, interceptor = self.run_async_lnd(lambda async_lnd: async_lnd.get_node_aliases(self.pub_keys), 3)
+
+        self.assertEqual({pub_key: self.graph.aliases[pub_key] for pub_key in self.pub_keys}, aliases)
+        self.assertEqual(3, interceptor.max_in_flight)
+
+    def test_get_edges_unknown_channel(self):
+        """Verifies channels unknown to lnd are left out"""
+        edges, _ = self.run_async_lnd(lambda async_lnd: async_lnd.get_edges(self.channel_ids[:2] + [1]), 4)
+
+        self.assertEqual(set(self.channel_ids[:2]), set(edges))
+
+    def test_get_route_no_route(self):
+        """Verifies None is returned if lnd does not find a route"""
+        routes, _ = self.run_async_lnd(
+            lambda async_lnd: async_lnd.get_route(None, 10 ** 12, [], [], None, None)
+        )
+
+        self.assertIsNone(routes)
+
+    def test_get_route_transient_error(self):
+        """Verifies transient errors are raised instead of being reported as no route"""
+        async def get_route(async_lnd):
+            async_lnd.info = ln.GetInfoResponse(identity_pubkey=self.graph.own_pubkey)
+            return await async_lnd.get_route(None, 1_000, [], [], None, None)
+
+        # nothing listens on the port of a stopped server
+        server, port = start_server(FakeLnd(self.graph), self.lnd_dir.name)
+        server.stop(None).wait()
+
+        with self.assertRaises(grpc.RpcError) as context:
+            self.run_async_lnd(get_route, port=port)
+        self.assertEqual(grpc.StatusCode.UNAVAILABLE, context.exception.code())
+
+    def test_prefetch_reuses_connection(self):
+        """Verifies all prefetches of an Lnd instance use the same connection"""
+        lnd = self.create_lnd(4)
+
+        lnd.prefetch_edges(self.channel_ids[:10])
+        async_lnd = lnd.async_lnd
+        lnd.prefetch_edges(self.channel_ids[10:])
+        lnd.prefetch_node_aliases(self.pub_keys)
+
+        self.assertIs(async_lnd, lnd.async_lnd)
+        self.assertEqual(len(self.channel_ids), self.get_calls(lnd, "Lightning/GetChanInfo"))
+        self.assertEqual(len(self.pub_keys), self.get_calls(lnd, "Lightning/GetNodeInfo"))
+        for channel_id in self.channel_ids:
+            self.assertIn(channel_id, lnd.edges)
+
+    def test_prefetch_sequential(self):
+        """Verifies nothing is loaded in parallel with a concurrency of 1, edges are loaded one after another"""
+        lnd = self.create_lnd(1)
+
+        lnd.prefetch_edges(self.channel_ids)
+        lnd.prefetch_node_aliases(self.pub_keys)
+
+        self.assertIsNone(lnd.async_lnd)
+        self.assertEqual(0, self.get_calls(lnd, "Lightning/GetChanInfo"))
+        for channel_id in self.channel_ids[:3]:
+            self.assertEqual(channel_id, lnd.get_edge(channel_id).channel_id)
+        self.assertEqual(3, self.get_calls(lnd, "Lightning/GetChanInfo"))
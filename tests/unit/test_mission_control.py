@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from disk_cache import DiskCache
+from grpc_generated import router_pb2 as lnrouter
+from mission_control import MissionControl
+from recording import ReplayError
+
+NODE_A = bytes.fromhex("02" + "aa" * 32)
+NODE_B = bytes.fromhex("03" + "bb" * 32)
+
+
+class FakeLnd:
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.imported = []
+        self.error = None
+
+    def query_mission_control(self):
+        return self.pairs
+
+    def import_mission_control(self, pairs):
+        if self.error:
+            raise self.error
+        self.imported.extend(pairs)
+
+
+class TestMissionControl(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.disk_cache = DiskCache(os.path.join(self.directory.name, "cache.sqlite"))
+        self.pair = lnrouter.PairHistory(
+            node_from=NODE_A, node_to=NODE_B, history=lnrouter.PairData(fail_time=1_000, fail_amt_msat=5_000)
+        )
+
+    def tearDown(self):
+        self.disk_cache.close()
+        self.directory.cleanup()
+
+    def test_store_and_restore(self):
+        """Verifies the pairs exported from lnd are imported again in the next run"""
+        MissionControl(FakeLnd([self.pair]), self.disk_cache).store()
+        lnd = FakeLnd([])
+
+        self.assertEqual(1, MissionControl(lnd, self.disk_cache).restore())
+        self.assertEqual([self.pair], lnd.imported)
+
+    def test_restore_without_stored_pairs(self):
+        """Verifies nothing is sent to lnd if no pairs are stored"""
+        self.assertEqual(0, MissionControl(FakeLnd([]), self.disk_cache).restore())
+
+    def test_restore_rejected(self):
+        """Verifies a failed import does not stop the rebalance"""
+        MissionControl(FakeLnd([self.pair]), self.disk_cache).store()
+        lnd = FakeLnd([])
+        lnd.error = ReplayError(None, "unknown method")
+
+        self.assertEqual(0, MissionControl(lnd, self.disk_cache).restore())
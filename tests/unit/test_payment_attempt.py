@@ -0,0 +1,42 @@
+import unittest
+
+import grpc
+
+from grpc_generated import lightning_pb2 as ln
+from payment_attempt import PaymentAttempt
+from recording import ReplayError, ReplayOutcome
+
+PAYMENT_HASH = bytes(32)
+
+
+class FakeLnd:
+    def __init__(self, payments):
+        self.payments = payments
+
+    def track_payment(self, payment_hash):
+        return iter(self.payments)
+
+
+class TestPaymentAttempt(unittest.TestCase):
+    def test_result(self):
+        """Verifies the result of SendToRouteV2 is returned"""
+        htlc = ln.HTLCAttempt(status=ln.HTLCAttempt.FAILED, failure=ln.Failure(code=ln.Failure.FEE_INSUFFICIENT))
+        attempt = PaymentAttempt(FakeLnd([]), PAYMENT_HASH, ReplayOutcome(htlc))
+
+        self.assertEqual(ln.Failure.FEE_INSUFFICIENT, attempt.result().failure.code)
+
+    def test_result_after_lost_connection(self):
+        """Verifies the result is tracked if the connection was lost while the HTLC was in flight"""
+        in_flight = ln.HTLCAttempt(status=ln.HTLCAttempt.IN_FLIGHT)
+        succeeded = ln.HTLCAttempt(status=ln.HTLCAttempt.SUCCEEDED, preimage=bytes(32))
+        lnd = FakeLnd([ln.Payment(htlcs=[in_flight]), ln.Payment(htlcs=[succeeded])])
+        attempt = PaymentAttempt(lnd, PAYMENT_HASH, ReplayError(grpc.StatusCode.UNAVAILABLE, "connection lost"))
+
+        self.assertEqual(ln.HTLCAttempt.SUCCEEDED, attempt.result().status)
+
+    def test_rejected(self):
+        """Verifies errors other than a lost connection are raised"""
+        attempt = PaymentAttempt(FakeLnd([]), PAYMENT_HASH, ReplayError(grpc.StatusCode.UNKNOWN, "invalid route"))
+
+        with self.assertRaises(grpc.RpcError):
+            attempt.result()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import grpc
+
+from grpc_generated import lightning_pb2 as ln
+from grpc_generated import lightning_pb2_grpc as lnrpc
+from recording import Recorder, RecordingInterceptor, ReplayChannel
+from rpc_stats import RpcStatistics, RpcStatisticsInterceptor
+
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "recording.jsonl")
+        recorder = Recorder(self.path)
+        recorder.record(
+            "/lnrpc.Lightning/GetInfo",
+            ln.GetInfoRequest().SerializeToString(),
+            [ln.GetInfoResponse(alias="node").SerializeToString()],
+            None,
+            12.5,
+        )
+        recorder.record(
+            "/lnrpc.Lightning/GetChanInfo",
+            ln.ChanInfoRequest(chan_id=1).SerializeToString(),
+            [],
+            {"code": "NOT_FOUND", "details": "edge not found"},
+            1,
+        )
+        recorder.record(
+            "/lnrpc.Lightning/GetChanInfo",
+            ln.ChanInfoRequest(chan_id=2).SerializeToString(),
+            [ln.ChannelEdge(channel_id=2).SerializeToString()],
+            None,
+            1,
+        )
+        recorder.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_replay(self):
+        """Verifies recorded responses and errors are replayed"""
+        stub = lnrpc.LightningStub(ReplayChannel(self.path))
+
+        self.assertEqual(stub.GetInfo(ln.GetInfoRequest()).alias, "node")
+        self.assertEqual(stub.GetInfo(ln.GetInfoRequest()).alias, "node")
+        self.assertEqual(stub.GetChanInfo(ln.ChanInfoRequest(chan_id=2)).channel_id, 2)
+        with self.assertRaises(grpc.RpcError) as context:
+            stub.GetChanInfo(ln.ChanInfoRequest(chan_id=1))
+        self.assertEqual(context.exception.code(), grpc.StatusCode.NOT_FOUND)
+
+    def test_replay_unknown_method(self):
+        """Verifies an error is raised if nothing was recorded for the method"""
+        stub = lnrpc.LightningStub(ReplayChannel(self.path))
+
+        with self.assertRaises(grpc.RpcError) as context:
+            stub.GetNodeInfo(ln.NodeInfoRequest(pub_key="a"))
+        self.assertEqual(context.exception.code(), grpc.StatusCode.UNAVAILABLE)
+
+    def test_record_replayed_calls(self):
+        """Verifies calls through intercepted channels are recorded"""
+        path = os.path.join(self.directory.name, "second.jsonl")
+        recorder = Recorder(path)
+        statistics = RpcStatistics()
+        channel = grpc.intercept_channel(
+            ReplayChannel(self.path), RpcStatisticsInterceptor(statistics), RecordingInterceptor(recorder)
+        )
+        stub = lnrpc.LightningStub(channel)
+        stub.GetInfo(ln.GetInfoRequest())
+        with self.assertRaises(grpc.RpcError):
+            stub.GetChanInfo(ln.ChanInfoRequest(chan_id=1))
+        recorder.close()
+
+        stub = lnrpc.LightningStub(ReplayChannel(path))
+        self.assertEqual(stub.GetInfo(ln.GetInfoRequest()).alias, "node")
+        self.assertEqual(statistics.get("Lightning/GetChanInfo").errors, 1)
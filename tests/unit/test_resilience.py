@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+import grpc
+
+from recording import ReplayError, ReplayOutcome
+from resilience import AsyncResilienceInterceptor, MAX_ATTEMPTS, ResilienceInterceptor
+
+CallDetails = namedtuple("CallDetails", ["method", "timeout"])
+
+
+class Continuation:
+    def __init__(self, outcomes, delays=()):
+        self.outcomes = list(outcomes)
+        self.delays = list(delays)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, client_call_details, request):
+        with self.lock:
+            self.calls.append(client_call_details)
+            outcome = self.outcomes.pop(0)
+            delay = self.delays.pop(0) if self.delays else 0
+        # not time.sleep, which is patched to skip the backoff
+        threading.Event().wait(delay)
+        return outcome
+
+
+def unavailable():
+    return ReplayError(grpc.StatusCode.UNAVAILABLE, "unavailable")
+
+
+@mock.patch("resilience.time.sleep", lambda _: None)
+class TestResilienceInterceptor(unittest.TestCase):
+    def test_deadline(self):
+        """Verifies a deadline is set for requests without a timeout"""
+        continuation = Continuation([ReplayOutcome("info")])
+
+        ResilienceInterceptor().intercept_unary_unary(continuation, CallDetails("/lnrpc.Lightning/GetInfo", None), None)
+
+        self.assertEqual(10, continuation.calls[0].timeout)
+
+    def test_no_deadline_for_payments(self):
+        """Verifies payments are not cancelled by a deadline"""
+        continuation = Continuation([ReplayOutcome("response")])
+
+        ResilienceInterceptor().intercept_unary_unary(
+            continuation, CallDetails("/routerrpc.Router/SendToRoute", None), None
+        )
+
+        self.assertIsNone(continuation.calls[0].timeout)
+
+    def test_retry_transient_error(self):
+        """Verifies idempotent requests are retried if lnd is unavailable"""
+        continuation = Continuation([unavailable(), ReplayOutcome("edge")])
+
+        outcome = ResilienceInterceptor().intercept_unary_unary(
+            continuation, CallDetails("/lnrpc.Lightning/GetChanInfo", None), None
+        )
+
+        self.assertEqual("edge", outcome.result())
+        self.assertEqual(2, len(continuation.calls))
+
+    def test_retry_gives_up(self):
+        """Verifies the last error is returned once all attempts failed"""
+        continuation = Continuation([unavailable() for _ in range(MAX_ATTEMPTS)])
+
+        outcome = ResilienceInterceptor().intercept_unary_unary(
+            continuation, CallDetails("/lnrpc.Lightning/GetChanInfo", None), None
+        )
+
+        self.assertEqual(grpc.StatusCode.UNAVAILABLE, outcome.exception().code())
+        self.assertEqual(MAX_ATTEMPTS, len(continuation.calls))
+
+    def test_no_retry_for_other_errors(self):
+        """Verifies requests are not retried if lnd rejected them"""
+        continuation = Continuation([ReplayError(grpc.StatusCode.UNKNOWN, "edge not found")])
+
+        ResilienceInterceptor().intercept_unary_unary(
+            continuation, CallDetails("/lnrpc.Lightning/GetChanInfo", None), None
+        )
+
+        self.assertEqual(1, len(continuation.calls))
+
+    def test_no_retry_for_payments(self):
+        """Verifies payments are never sent twice"""
+        continuation = Continuation([unavailable()])
+
+        ResilienceInterceptor().intercept_unary_unary(
+            continuation, CallDetails("/routerrpc.Router/SendToRoute", None), None
+        )
+
+        self.assertEqual(1, len(continuation.calls))
+
+    @mock.patch("resilience.DEFAULT_HEDGE_DELAY", 0.01)
+    def test_hedged_request(self):
+        """Verifies the response of the second request is used if the first one is slow"""
+        continuation = Continuation([ReplayOutcome("slow"), ReplayOutcome("fast")], [0.5, 0])
+
+        outcome = ResilienceInterceptor(hedge_reads=True).intercept_unary_unary(
+            continuation, CallDetails("/lnrpc.Lightning/GetNodeInfo", None), None
+        )
+
+        self.assertEqual("fast", outcome.result())
+        self.assertEqual(2, len(continuation.calls))
+
+
+@mock.patch("resilience.asyncio.sleep", mock.AsyncMock())
+class TestAsyncResilienceInterceptor(unittest.TestCase):
+    def test_retry_transient_error(self):
+        """Verifies idempotent requests are retried if lnd is unavailable"""
+        outcomes = [unavailable(), "alias"]
+        calls = []
+
+        async def continuation(client_call_details, request):
+            calls.append(client_call_details)
+            outcome = outcomes.pop(0)
+
+            async def call():
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+            return call()
+
+        response = asyncio.run(AsyncResilienceInterceptor().intercept_unary_unary(
+            continuation, CallDetails("/lnrpc.Lightning/GetNodeInfo", None), None
+        ))
+
+        self.assertEqual("alias", response)
+        self.assertEqual([10, 10], [details.timeout for details in calls])
@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+import unittest
+
+from fake_lnd import BLOCK_HEIGHT, FINAL_CLTV_DELTA, FakeLnd, create_lnd_dir, generate_graph, start_server
+from graph import ChannelGraph
+from grpc_generated import lightning_pb2 as ln
+from lnd import INVOICE_CLTV_EXPIRY, Lnd
+from output import Output
+from route_engine import BLOCK_PADDING, RouteEngine
+from routes import Routes
+
+AMOUNT_MSAT = 100_000_000
+
+
+class TestRouteEngine(unittest.TestCase):
+    def setUp(self):
+        self.fake_graph = generate_graph(200, 800, 10, seed=1)
+        self.own_pubkey = self.fake_graph.own_pubkey
+        fake_lnd = FakeLnd(self.fake_graph)
+        self.own_channels = [fake_lnd.get_channel(channel) for channel in self.fake_graph.get_own_channels()]
+        channels = sorted(self.own_channels, key=lambda channel: -channel.local_balance)
+        self.first_channel = channels[0]
+        self.last_channel = channels[-1]
+        self.graph = ChannelGraph([channel.to_edge() for channel in self.fake_graph.channels.values()])
+        self.engine = RouteEngine(self.graph, self.own_pubkey)
+        self.ignored_pairs = {}
+        self.ignored_nodes = {}
+
+    def get_routes(self, fee_limit_msat=None, max_paths=20):
+        return list(self.engine.get_routes(
+            AMOUNT_MSAT,
+            BLOCK_HEIGHT,
+            FINAL_CLTV_DELTA,
+            self.own_channels,
+            self.first_channel.chan_id,
+            self.last_channel.remote_pubkey,
+            fee_limit_msat,
+            self.ignored_pairs,
+            self.ignored_nodes,
+            max_paths,
+        ))
+
+    def test_routes(self):
+        """Verifies distinct loopless routes from the first hop channel to the last hop node are returned"""
+        routes = self.get_routes()
+
+        self.assertGreater(len(routes), 10)
+        self.assertEqual(len(routes), len({tuple(hop.chan_id for hop in route.hops) for route in routes}))
+        for route in routes:
+            self.assertEqual(self.first_channel.chan_id, route.hops[0].chan_id)
+            self.assertEqual(self.last_channel.remote_pubkey, route.hops[-2].pub_key)
+            self.assertEqual(self.own_pubkey, route.hops[-1].pub_key)
+            self.assertEqual(len(route.hops), len({hop.pub_key for hop in route.hops}))
+            self.assertEqual(AMOUNT_MSAT, route.hops[-1].amt_to_forward_msat)
+
+    def test_first_route_matches_fake_lnd(self):
+        """Verifies the cheapest route is the one lnd (simulated by the fake node) would return"""
+        expected = self.fake_graph.find_route(
+            self.own_pubkey, AMOUNT_MSAT, self.last_channel.remote_pubkey, self.first_channel.chan_id
+        )
+
+        route = self.get_routes(max_paths=1)[0]
+
+        self.assertEqual(expected, route)
+
+    def test_fee_limit(self):
+        """Verifies no route exceeds the fee limit"""
+        fee_limit_msat = self.get_routes(max_paths=5)[-1].total_fees_msat
+
+        routes = self.get_routes(fee_limit_msat=fee_limit_msat)
+
+        self.assertTrue(routes)
+        self.assertTrue(all(route.total_fees_msat <= fee_limit_msat for route in routes))
+
+    def test_channel_added_later(self):
+        """Verifies channels added to the graph after the engine was created are used"""
+        node1_pub, node2_pub = sorted([self.first_channel.remote_pubkey, self.last_channel.remote_pubkey])
+        policy = ln.RoutingPolicy(time_lock_delta=40, min_htlc=1_000, max_htlc_msat=10 * AMOUNT_MSAT, last_update=1)
+        self.graph.add_edge(ln.ChannelEdge(
+            channel_id=1, node1_pub=node1_pub, node2_pub=node2_pub, capacity=AMOUNT_MSAT // 100,
+            node1_policy=policy, node2_policy=policy,
+        ))
+
+        route = self.get_routes(max_paths=1)[0]
+
+        self.assertEqual(
+            [self.first_channel.chan_id, 1, self.last_channel.chan_id], [hop.chan_id for hop in route.hops]
+        )
+
+    def test_ignored_pairs(self):
+        """Verifies pairs ignored while iterating over the routes are not used by subsequent routes"""
+        routes = self.engine.get_routes(
+            AMOUNT_MSAT,
+            BLOCK_HEIGHT,
+            FINAL_CLTV_DELTA,
+            self.own_channels,
+            self.first_channel.chan_id,
+            self.last_channel.remote_pubkey,
+            None,
+            self.ignored_pairs,
+            self.ignored_nodes,
+            20,
+        )
+        first = next(routes)
+        hop = first.hops[1]
+        key = (bytes.fromhex(first.hops[0].pub_key), bytes.fromhex(hop.pub_key))
+        self.ignored_pairs[key] = {"from": key[0], "to": key[1]}
+
+        for route in routes:
+            self.assertNotIn(hop.chan_id, [route_hop.chan_id for route_hop in route.hops])
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is required to create the TLS certificate")
+class TestLocalRoutes(unittest.TestCase):
+    def setUp(self):
+        graph = generate_graph(200, 800, 10, seed=1)
+        # the routes only consider the capacity of remote channels, make sure the payment does not fail
+        for channel in graph.channels.values():
+            if graph.own_pubkey not in (channel.node1_pub, channel.node2_pub):
+                channel.node1_balance_msat = channel.capacity * 500
+        lnd_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lnd_dir.cleanup)
+        create_lnd_dir(lnd_dir.name, "regtest")
+        server, port = start_server(FakeLnd(graph), lnd_dir.name)
+        self.addCleanup(server.stop, None)
+        self.lnd = Lnd(lnd_dir.name, f"localhost:{port}", "regtest", local_routes=True)
+
+    def test_route_for_invoice(self):
+        """Verifies the route uses the final CLTV delta of the invoice, so that the payment is accepted"""
+        channels = sorted(self.lnd.get_channels(), key=lambda channel: -channel.local_balance)
+        payment_request = self.lnd.generate_invoice("memo", AMOUNT_MSAT // 1_000)
+        routes = Routes(self.lnd, payment_request, channels[0], channels[-1], None, Output(self.lnd))
+
+        route = routes.get_next()
+
+        self.assertEqual(BLOCK_HEIGHT + INVOICE_CLTV_EXPIRY + BLOCK_PADDING, route.hops[-1].expiry)
+        self.assertEqual(ln.HTLCAttempt.SUCCEEDED, self.lnd.send_payment(payment_request, route).status)
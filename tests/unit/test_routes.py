@@ -0,0 +1,181 @@
+import unittest
+
+from graph import ChannelGraph
+from grpc_generated import lightning_pb2 as ln
+from lnd import Lnd
+from routes import MAX_FAILURES_PER_NODE, MAX_ROUTES_TO_REQUEST, Routes
+
+NODE_A = "02" + "aa" * 32
+NODE_B = "03" + "bb" * 32
+NODE_C = "02" + "cc" * 32
+PEER = "03" + "dd" * 32
+
+
+class FakeOutput:
+    def __init__(self):
+        self.lines = []
+
+    def print_line(self, line):
+        self.lines.append(line)
+
+    def get_channel_representation(self, chan_id, to_pubkey, from_pubkey):
+        return f"{chan_id}"
+
+
+class FakeLnd:
+    get_route_request = staticmethod(Lnd.get_route_request)
+
+    def __init__(self, graph=None):
+        self.requests = []
+        self.graph = graph
+
+    def get_own_pubkey(self):
+        return NODE_A
+
+    def get_channels(self):
+        return [ln.Channel(remote_pubkey=PEER)]
+
+    def get_node_alias(self, pub_key):
+        return pub_key[:8]
+
+    def query_routes(self, request):
+        self.requests.append(request)
+        return []
+
+    def get_route_engine(self):
+        return None
+
+    def get_graph(self):
+        return self.graph
+
+
+class TestRoutes(unittest.TestCase):
+    def create_routes(self, output=None, graph=None):
+        return Routes(FakeLnd(graph), ln.PayReq(num_satoshis=1_000), None, None, None, output or FakeOutput())
+
+    def test_ignore_edge(self):
+        """Verifies an edge is ignored (and reported) only once"""
+        output = FakeOutput()
+        routes = self.create_routes(output)
+
+        routes.ignore_edge_from_to(1, NODE_A, NODE_B)
+        routes.ignore_edge_from_to(1, NODE_A.upper(), NODE_B)
+        routes.ignore_edge_from_to(1, NODE_B, NODE_A)
+
+        self.assertEqual(
+            [
+                {"from": bytes.fromhex(NODE_A), "to": bytes.fromhex(NODE_B)},
+                {"from": bytes.fromhex(NODE_B), "to": bytes.fromhex(NODE_A)},
+            ],
+            list(routes.ignored_pairs.values()),
+        )
+        self.assertEqual(2, len(output.lines))
+
+    def test_state_is_not_shared(self):
+        """Verifies routes and ignored edges of one rebalance do not affect another one"""
+        routes = self.create_routes()
+        routes.ignore_edge_from_to(1, NODE_A, NODE_B)
+        routes.add_route(create_route(1_000, [1, 2]))
+
+        other_routes = self.create_routes()
+
+        self.assertEqual({}, other_routes.ignored_pairs)
+        self.assertEqual(0, len(other_routes.pending_routes))
+
+    def test_add_route(self):
+        """Verifies routes are returned in order and each route is returned only once"""
+        routes = self.create_routes()
+        routes.num_requested_routes = MAX_ROUTES_TO_REQUEST
+        first = create_route(1_000, [1, 2])
+        second = create_route(1_000, [1, 3])
+        routes.add_route(first)
+        routes.add_route(second)
+        routes.add_route(create_route(1_000, [1, 2]))
+
+        self.assertEqual([first, second], [routes.get_next(), routes.get_next()])
+        routes.add_route(create_route(1_000, [1, 2]))
+        self.assertFalse(routes.has_next())
+
+    def test_add_route_with_updated_fees(self):
+        """Verifies a route is returned again if the fees changed"""
+        routes = self.create_routes()
+        routes.num_requested_routes = MAX_ROUTES_TO_REQUEST
+        routes.add_route(create_route(1_000, [1, 2]))
+        routes.get_next()
+
+        routes.add_route(create_route(1_001, [1, 2]))
+
+        self.assertTrue(routes.has_next())
+
+    def test_route_request_is_reused(self):
+        """Verifies the same request is sent for each query, including pairs ignored after the first query"""
+        routes = self.create_routes()
+        routes.ignore_edge_from_to(1, NODE_A, NODE_B)
+        routes.request_route()
+
+        routes.ignore_edge_from_to(2, NODE_B, NODE_A)
+        routes.request_route()
+
+        first_request, second_request = routes.lnd.requests
+        self.assertIs(first_request, second_request)
+        self.assertEqual(
+            [(bytes.fromhex(NODE_A), bytes.fromhex(NODE_B)), (bytes.fromhex(NODE_B), bytes.fromhex(NODE_A))],
+            [(getattr(pair, "from"), pair.to) for pair in second_request.ignored_pairs],
+        )
+        self.assertEqual(1_000, second_request.amt)
+
+    def test_ignore_node(self):
+        """Verifies a node is ignored instead of its channels once it failed to forward several payments"""
+        routes = self.create_routes()
+        routes.ignore_edge_from_to(1, NODE_C, NODE_B)
+        routes.request_route()
+        for chan_id in range(2, 2 + MAX_FAILURES_PER_NODE):
+            routes.ignore_edge_on_route(NODE_B, create_route(1_000, [1, chan_id], [NODE_B, f"02{chan_id:064x}"]))
+
+        routes.ignore_edge_from_to(10, NODE_A, NODE_B)
+
+        self.assertEqual([bytes.fromhex(NODE_B)], list(routes.ignored_nodes))
+        self.assertEqual({}, routes.ignored_pairs)
+        request = routes.get_route_request()
+        self.assertEqual([bytes.fromhex(NODE_B)], list(request.ignored_nodes))
+        self.assertEqual(0, len(request.ignored_pairs))
+
+    def test_ignored_channels_do_not_ignore_node(self):
+        """Verifies channels ignored without a failure (like --exclude) do not cause the node to be ignored"""
+        routes = self.create_routes()
+        for chan_id in range(MAX_FAILURES_PER_NODE + 1):
+            routes.ignore_edge_from_to(chan_id, NODE_B, f"02{chan_id:064x}")
+
+        self.assertEqual({}, routes.ignored_nodes)
+        self.assertEqual(MAX_FAILURES_PER_NODE + 1, len(routes.ignored_pairs))
+
+    def test_ignore_node_all_peers_ignored(self):
+        """Verifies a node is ignored once the channels to all of its peers (according to the graph) are ignored"""
+        graph = ChannelGraph([
+            ln.ChannelEdge(channel_id=1, node1_pub=NODE_B, node2_pub=NODE_C),
+            ln.ChannelEdge(channel_id=2, node1_pub=NODE_B, node2_pub=NODE_C),
+            ln.ChannelEdge(channel_id=3, node1_pub=NODE_A, node2_pub=NODE_B),
+        ])
+        routes = self.create_routes(graph=graph)
+
+        routes.ignore_edge_from_to(1, NODE_B, NODE_C)
+        self.assertEqual({}, routes.ignored_nodes)
+        routes.ignore_edge_from_to(3, NODE_B, NODE_A)
+
+        self.assertEqual([bytes.fromhex(NODE_B)], list(routes.ignored_nodes))
+
+    def test_protected_nodes_are_not_ignored(self):
+        """Verifies our own node and our peers are never ignored"""
+        routes = self.create_routes()
+        for chan_id in range(MAX_FAILURES_PER_NODE):
+            routes.ignore_edge_on_route(NODE_A, create_route(1_000, [1, chan_id], [NODE_A, f"02{chan_id:064x}"]))
+            routes.ignore_edge_on_route(PEER, create_route(1_000, [1, chan_id], [PEER, f"03{chan_id:064x}"]))
+
+        self.assertEqual({}, routes.ignored_nodes)
+        self.assertEqual(2 * MAX_FAILURES_PER_NODE, len(routes.ignored_pairs))
+
+
+def create_route(total_amt_msat, channel_ids, pub_keys=None):
+    pub_keys = pub_keys or [""] * len(channel_ids)
+    hops = [ln.Hop(chan_id=chan_id, pub_key=pub_key) for chan_id, pub_key in zip(channel_ids, pub_keys)]
+    return ln.Route(total_amt_msat=total_amt_msat, hops=hops)
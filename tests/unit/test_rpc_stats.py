@@ -0,0 +1,70 @@
+import unittest
+from collections import namedtuple
+
+from grpc_generated import lightning_pb2 as ln
+from rpc_stats import RpcStatistics, RpcStatisticsInterceptor, MethodStatistics, get_method_name
+
+CallDetails = namedtuple("CallDetails", ["method"])
+
+
+class Outcome:
+    def __init__(self, response=None, exception=None):
+        self.response = response
+        self.error = exception
+
+    def exception(self):
+        return self.error
+
+    def result(self):
+        return self.response
+
+    def add_done_callback(self, callback):
+        callback(self)
+
+
+class TestRpcStatistics(unittest.TestCase):
+    def test_get_method_name(self):
+        """Verifies the package name is removed"""
+        self.assertEqual(get_method_name("/lnrpc.Lightning/GetInfo"), "Lightning/GetInfo")
+        self.assertEqual(get_method_name(b"/routerrpc.Router/SendToRoute"), "Router/SendToRoute")
+
+    def test_method_statistics(self):
+        """Verifies counters, histogram and percentiles"""
+        statistics = MethodStatistics()
+        for latency_ms in [3, 4, 15, 40_000]:
+            statistics.record(latency_ms, False, 10, 100)
+        statistics.record(1, True, 10, 0)
+
+        self.assertEqual(statistics.calls, 5)
+        self.assertEqual(statistics.errors, 1)
+        self.assertEqual(statistics.request_bytes, 50)
+        self.assertEqual(statistics.response_bytes, 400)
+        self.assertEqual(statistics.max_latency_ms, 40_000)
+        self.assertEqual(sum(statistics.latency_histogram), 5)
+        self.assertEqual(statistics.get_latency_percentile_ms(50), 5)
+        self.assertEqual(statistics.get_latency_percentile_ms(100), 40_000)
+
+    def test_percentile_not_above_max_latency(self):
+        """Verifies the percentile does not exceed the largest latency, even if the bucket is larger"""
+        statistics = MethodStatistics()
+        for latency_ms in [12, 18, 21]:
+            statistics.record(latency_ms, False, 10, 100)
+
+        self.assertEqual(statistics.get_latency_percentile_ms(50), 20)
+        self.assertEqual(statistics.get_latency_percentile_ms(90), 21)
+
+    def test_interceptor(self):
+        """Verifies successful and failed calls are recorded"""
+        statistics = RpcStatistics()
+        interceptor = RpcStatisticsInterceptor(statistics)
+        details = CallDetails("/lnrpc.Lightning/GetInfo")
+        request = ln.GetInfoRequest()
+        response = ln.GetInfoResponse(alias="alias")
+
+        interceptor.intercept_unary_unary(lambda d, r: Outcome(response=response), details, request)
+        interceptor.intercept_unary_unary(lambda d, r: Outcome(exception=Exception()), details, request)
+
+        method_statistics = statistics.get("Lightning/GetInfo")
+        self.assertEqual(method_statistics.calls, 2)
+        self.assertEqual(method_statistics.errors, 1)
+        self.assertEqual(method_statistics.response_bytes, response.ByteSize())